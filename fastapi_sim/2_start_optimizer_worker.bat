@@ -4,7 +4,7 @@ echo   Starting Optimizer Background Worker
 echo ============================================================
 echo.
 echo This worker runs optimization tasks independently
-echo It polls Firebase every 10 seconds for optimization requests
+echo It listens to Firebase for optimization requests (polls every 10 seconds only as a fallback)
 echo.
 echo Make sure the main server is running first!
 echo.
@@ -0,0 +1,114 @@
+"""
+Shared Firebase helpers for the server and the standalone scripts (optimizer worker, Firebase tests)
+Initializes the Admin SDK once per process and hands out the same Firestore client,
+plus a small round-robin pool of clients for write-heavy callers, and the wait logic
+for optimizer_state snapshot listeners
+"""
+
+import asyncio
+import itertools
+import os
+
+# Extra clients (one gRPC channel each) handed out round-robin by get_pooled_db
+POOL_SIZE = int(os.getenv("FIRESTORE_CLIENT_POOL_SIZE", "4"))
+
+_db = None
+_pool = None
+
+def _initialize_app(name=None):
+    """Initialize a firebase_admin app (the default one when name is None)"""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    kwargs = {} if name is None else {'name': name}
+
+    # Try production path first (Render secret files)
+    service_key_path = "/etc/secrets/serviceAccountKey.json"
+
+    # Fallback to local development path
+    if not os.path.exists(service_key_path):
+        service_key_path = os.path.join(os.path.dirname(__file__), "serviceAccountKey.json")
+
+    if os.path.exists(service_key_path):
+        cred = credentials.Certificate(service_key_path)
+        app = firebase_admin.initialize_app(cred, **kwargs)
+        if name is None:
+            print(f"✓ Firebase initialized with service account key: {service_key_path}")
+    else:
+        # Use default credentials (works with environment variables)
+        app = firebase_admin.initialize_app(options={
+            'projectId': 'optex-b13d3',
+        }, **kwargs)
+        if name is None:
+            print("✓ Firebase initialized with default credentials")
+    return app
+
+def get_db():
+    """Return the process-wide Firestore client, initializing Firebase on first use (None on failure)"""
+    global _db
+    if _db is not None:
+        return _db
+
+    # Deferred so scripts only pay for the firebase_admin import (and its gRPC threads) when they need it
+    import firebase_admin
+    from firebase_admin import firestore
+
+    try:
+        if not firebase_admin._apps:
+            _initialize_app()
+
+        _db = firestore.client()
+        print("✓ Firestore client ready")
+        return _db
+    except Exception as e:
+        print(f"⚠ Firebase initialization failed: {e}")
+        return None
+
+def get_pooled_db():
+    """Return the next of POOL_SIZE Firestore clients (separate named apps, so separate channels)
+
+    Concurrent writers spread over several channels instead of queueing on one.
+    Falls back to the get_db() client when the pool can't be built.
+    """
+    global _pool
+    if _pool is None:
+        import firebase_admin
+        from firebase_admin import firestore
+
+        primary = get_db()
+        if primary is None:
+            return None
+        clients = [primary]
+        try:
+            for i in range(1, POOL_SIZE):
+                name = f"optex-pool-{i}"
+                try:
+                    app = firebase_admin.get_app(name)
+                except ValueError:
+                    app = _initialize_app(name)
+                clients.append(firestore.client(app))
+        except Exception as e:
+            print(f"⚠ Firestore client pool unavailable, using a single client: {e}")
+        _pool = itertools.cycle(clients)
+    return next(_pool)
+
+# optimizer_state listeners (main.py's integrated worker and optimizer_worker.py)
+POLL_INTERVAL = 10.0  # seconds, fallback when the listener can't be attached
+LISTENER_MAX_WAIT = 30.0  # seconds, upper bound on a sleep between checks while listening
+
+async def wait_for_state_change(state_changed, remaining):
+    """Sleep until state_changed is set or the optimizer timer is due
+
+    remaining: seconds until the timer expires, or None when nothing is scheduled
+    """
+    if remaining is None:
+        timeout = LISTENER_MAX_WAIT
+    elif remaining <= 0:
+        timeout = POLL_INTERVAL  # Still due right after a check - retry at the old poll rate
+    else:
+        timeout = min(remaining, LISTENER_MAX_WAIT)
+    try:
+        await asyncio.wait_for(state_changed.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    state_changed.clear()
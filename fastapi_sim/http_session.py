@@ -0,0 +1,16 @@
+"""
+Pooled requests.Session shared by the test scripts that call the FastAPI backend
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+def make_session():
+    """Session that keeps connections to the backend alive and retries failed connects"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20,
+                          max_retries=Retry(total=3, backoff_factor=0.3))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
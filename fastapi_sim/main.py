@@ -1,6 +1,8 @@
 # main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Optional, List, Any
 import numpy as np
@@ -8,15 +10,25 @@ import time
 import joblib
 import pandas as pd
 import os
+import hashlib
+import io
 import optuna
 from threading import Lock
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import credentials, firestore, firestore_async
+from google.api_core import exceptions as gcp_exceptions
 import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
 from contextlib import asynccontextmanager
 
+from firebase_client import POLL_INTERVAL, wait_for_state_change
+
+# Optimizer logging (queue-backed, OPTEX_LOG_LEVEL / OPTEX_LOG_FILE) - shared with optimizer_worker.py
+from optex_logging import logger, log_listener as _log_listener
+
 # Global variable for background task
 background_task = None
 optimizer_enabled = True  # Flag to enable/disable optimizer
@@ -26,6 +38,7 @@ async def lifespan(app: FastAPI):
     """Manage application lifespan - startup and shutdown events"""
     # Startup: Start the optimizer worker in background
     global background_task, optimizer_enabled
+    _log_listener.start()
     print("\n🚀 Starting application with integrated optimizer worker...")
     
     if optimizer_enabled:
@@ -44,8 +57,13 @@ async def lifespan(app: FastAPI):
             await background_task
         except asyncio.CancelledError:
             print("✓ Optimizer worker stopped")
+    
+    # Commit any optimization results still waiting in the write buffer
+    await asyncio.to_thread(flush_optimization_writes)
+    _FS_POOL.shutdown(wait=True)
+    _log_listener.stop()
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Allow CORS for local frontend development (your original code, which is correct)
 app.add_middleware(
@@ -56,12 +74,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON bodies (optimization results, history) for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Initialize Firebase Admin SDK
 try:
     # Initialize Firebase if not already initialized
     if not firebase_admin._apps:
-        import os
-        
         # Try production path first (Render secret files)
         service_key_path = "/etc/secrets/serviceAccountKey.json"
         
@@ -81,11 +100,15 @@ try:
             print("✓ Firebase initialized with default credentials")
     
     db = firestore.client()
+    # Native asyncio client for reads/writes made from async handlers; the sync client is
+    # kept for the snapshot listener and the thread-pooled batch writes
+    db_async = firestore_async.client()
     print("✓ Firestore client ready")
 except Exception as e:
     print(f"⚠ Firebase initialization failed: {e}")
     print("⚠ Optimization will proceed without APC limits from Firebase")
     db = None
+    db_async = None
 
 # Pricing configuration (can be updated via API)
 class PricingConfig(BaseModel):
@@ -100,8 +123,19 @@ class PricingConfig(BaseModel):
 # Global pricing config
 pricing_config = PricingConfig()
 
-# Optimization history storage
-optimization_history = []
+# Pricing fields echoed back in optimization responses
+PRICING_DETAIL_FIELDS = frozenset({
+    'limestone_price_per_ton',
+    'clay_price_per_ton',
+    'traditional_fuel_price_per_kg',
+    'alternative_fuel_price_per_kg',
+    'clinker_selling_price_per_ton',
+    'electricity_price_per_kwh',
+    'byproduct_credit_per_ton'
+})
+
+# Optimization history storage (last 100 runs, oldest evicted automatically)
+optimization_history = deque(maxlen=100)
 optimization_history_lock = Lock()
 
 # --- Load ML Models for Predictions ---
@@ -298,9 +332,13 @@ def predict_lsf_from_features(limestone_pct, clay_pct, mill_power, mill_vibratio
 # ML-based relationship learning
 class MLRelationshipModel:
     def __init__(self):
-        self.models = {}
-        self.scalers = {}
-        self.is_trained = False
+        # (scaler, models) - retraining builds a fresh pair and swaps it in with one
+        # assignment, so optimizer threads predicting concurrently never see unfitted estimators
+        self.fitted = None
+    
+    @property
+    def is_trained(self):
+        return self.fitted is not None
         
     def train_from_historical_data(self, plant_history):
         """Train ML models to learn complex relationships"""
@@ -339,32 +377,36 @@ class MLRelationshipModel:
         X = np.array(X_data)
         
         # Train separate models for each constraint variable
-        self.scalers['X'] = StandardScaler()
-        X_scaled = self.scalers['X'].fit_transform(X)
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+        models = {}
         
         # Burning zone temperature model
-        self.models['temp'] = RandomForestRegressor(n_estimators=50, random_state=42)
-        self.models['temp'].fit(X_scaled, y_temp)
+        models['temp'] = RandomForestRegressor(n_estimators=50, random_state=42)
+        models['temp'].fit(X_scaled, y_temp)
         
         # Kiln motor torque model
-        self.models['torque'] = RandomForestRegressor(n_estimators=50, random_state=42)
-        self.models['torque'].fit(X_scaled, y_torque)
+        models['torque'] = RandomForestRegressor(n_estimators=50, random_state=42)
+        models['torque'].fit(X_scaled, y_torque)
         
         # Kiln inlet O2 model
-        self.models['o2'] = RandomForestRegressor(n_estimators=50, random_state=42)
-        self.models['o2'].fit(X_scaled, y_o2)
+        models['o2'] = RandomForestRegressor(n_estimators=50, random_state=42)
+        models['o2'].fit(X_scaled, y_o2)
         
         # ID fan power model
-        self.models['fan_power'] = RandomForestRegressor(n_estimators=50, random_state=42)
-        self.models['fan_power'].fit(X_scaled, y_fan_power)
+        models['fan_power'] = RandomForestRegressor(n_estimators=50, random_state=42)
+        models['fan_power'].fit(X_scaled, y_fan_power)
         
-        self.is_trained = True
+        # Publish the fully fitted set atomically
+        self.fitted = (scaler, models)
         return True
         
     def predict_constraints(self, optimization_vars):
         """Predict constraint variables using ML models"""
-        if not self.is_trained:
+        fitted = self.fitted  # One read - a concurrent retrain can't mix old and new models
+        if fitted is None:
             return None
+        scaler, models = fitted
             
         features = np.array([[
             optimization_vars.get('trad_fuel_rate_kg_hr', 1200),
@@ -374,13 +416,13 @@ class MLRelationshipModel:
             optimization_vars.get('id_fan_speed_pct', 75)
         ]])
         
-        X_scaled = self.scalers['X'].transform(features)
+        X_scaled = scaler.transform(features)
         
         predictions = {
-            'burning_zone_temp_c': float(self.models['temp'].predict(X_scaled)[0]),
-            'kiln_motor_torque_pct': float(self.models['torque'].predict(X_scaled)[0]),
-            'kiln_inlet_o2_pct': float(self.models['o2'].predict(X_scaled)[0]),
-            'id_fan_power_kw': float(self.models['fan_power'].predict(X_scaled)[0])
+            'burning_zone_temp_c': float(models['temp'].predict(X_scaled)[0]),
+            'kiln_motor_torque_pct': float(models['torque'].predict(X_scaled)[0]),
+            'kiln_inlet_o2_pct': float(models['o2'].predict(X_scaled)[0]),
+            'id_fan_power_kw': float(models['fan_power'].predict(X_scaled)[0])
         }
         
         return predictions
@@ -487,6 +529,36 @@ hybrid_model = HybridProcessModel()
 
 # --- A Simplified First-Principles Plant Simulator ---
 
+# (group, field, decimals) for every value in the step() packet, in packing order
+_STEP_FIELDS = (
+    ('kpi', 'shc_kcal_kg', 1),
+    ('kpi', 'lsf', 2),
+    ('kpi', 'sec_kwh_ton', 2),
+    ('kpi', 'tsr_pct', 2),
+    ('raw_mill', 'limestone_feeder_pct', 2),
+    ('raw_mill', 'clay_feeder_pct', 2),
+    ('raw_mill', 'power_kw', 0),
+    ('raw_mill', 'mill_power_kwh_ton', 2),
+    ('raw_mill', 'mill_vibration_mm_s', 2),
+    ('raw_mill', 'separator_speed_rpm', 0),
+    ('raw_mill', 'mill_throughput_tph', 1),
+    ('kiln', 'burning_zone_temp_c', 1),
+    ('kiln', 'kiln_inlet_temp_c', 1),
+    ('kiln', 'trad_fuel_rate_kg_hr', 0),
+    ('kiln', 'alt_fuel_rate_kg_hr', 0),
+    ('kiln', 'raw_meal_feed_rate_tph', 1),
+    ('kiln', 'limestone_to_clay_ratio', 2),
+    ('kiln', 'kiln_speed_rpm', 2),
+    ('kiln', 'kiln_motor_torque_pct', 1),
+    ('kiln', 'id_fan_speed_pct', 1),
+    ('kiln', 'id_fan_power_kw', 0),
+    ('kiln', 'kiln_inlet_o2_pct', 2),
+    ('kiln', 'kiln_outlet_o2_pct', 2),
+    ('production', 'clinker_rate_tph', 2),
+    ('production', 'clinker_temp_c', 1),
+)
+_STEP_SCALE = 10.0 ** np.array([decimals for _, _, decimals in _STEP_FIELDS])
+
 class PlantSimulator:
     def __init__(self):
         # --- State Variables ---
@@ -632,42 +704,40 @@ class PlantSimulator:
         # Calculate limestone to clay ratio from raw material percentages
         limestone_to_clay_ratio = limestone_pct / clay_pct if clay_pct > 0 else 4.0
 
-        return {
-            "timestamp": int(time.time()),
-            "kpi": {
-                "shc_kcal_kg": round(final_shc, 1),
-                "lsf": round(predicted_lsf, 2),  # Using soft sensor prediction
-                "sec_kwh_ton": round(sec_kwh_ton, 2),
-                "tsr_pct": round(tsr_pct, 2)
-            },
-            "raw_mill": {
-                "limestone_feeder_pct": round(limestone_pct, 2),
-                "clay_feeder_pct": round(clay_pct, 2),
-                "power_kw": round(raw_mill_power_kw, 0),
-                "mill_power_kwh_ton": round(mill_power_kwh_ton, 2),
-                "mill_vibration_mm_s": round(mill_vibration_mm_s, 2),
-                "separator_speed_rpm": round(separator_speed_rpm, 0),
-                "mill_throughput_tph": round(mill_throughput_tph, 1)
-            },
-            "kiln": {
-                "burning_zone_temp_c": round(burning_zone_temp_c, 1),
-                "kiln_inlet_temp_c": round(kiln_inlet_temp_c, 1),
-                "trad_fuel_rate_kg_hr": round(trad_fuel_rate_kg_hr, 0),
-                "alt_fuel_rate_kg_hr": round(alt_fuel_rate_kg_hr, 0),
-                "raw_meal_feed_rate_tph": round(raw_meal_feed_rate_tph, 1),
-                "limestone_to_clay_ratio": round(limestone_to_clay_ratio, 2),
-                "kiln_speed_rpm": round(kiln_speed_rpm, 2),
-                "kiln_motor_torque_pct": round(kiln_motor_torque_pct, 1),
-                "id_fan_speed_pct": round(id_fan_speed_pct, 1),
-                "id_fan_power_kw": round(id_fan_power_kw, 0),
-                "kiln_inlet_o2_pct": round(kiln_inlet_o2_pct, 2),
-                "kiln_outlet_o2_pct": round(kiln_outlet_o2_pct, 2)
-            },
-            "production": {
-                "clinker_rate_tph": round(clinker_production_rate_kg_hr / 1000, 2),
-                "clinker_temp_c": round(clinker_temp_c, 1)
-            }
-        }
+        # Values in _STEP_FIELDS order, rounded in a single vectorized pass
+        values = np.array([
+            final_shc,
+            predicted_lsf,  # Using soft sensor prediction
+            sec_kwh_ton,
+            tsr_pct,
+            limestone_pct,
+            clay_pct,
+            raw_mill_power_kw,
+            mill_power_kwh_ton,
+            mill_vibration_mm_s,
+            separator_speed_rpm,
+            mill_throughput_tph,
+            burning_zone_temp_c,
+            kiln_inlet_temp_c,
+            trad_fuel_rate_kg_hr,
+            alt_fuel_rate_kg_hr,
+            raw_meal_feed_rate_tph,
+            limestone_to_clay_ratio,
+            kiln_speed_rpm,
+            kiln_motor_torque_pct,
+            id_fan_speed_pct,
+            id_fan_power_kw,
+            kiln_inlet_o2_pct,
+            kiln_outlet_o2_pct,
+            clinker_production_rate_kg_hr / 1000,
+            clinker_temp_c
+        ], dtype=np.float64)
+        rounded = (np.rint(values * _STEP_SCALE) / _STEP_SCALE).tolist()
+        
+        packet = {"timestamp": int(time.time()), "kpi": {}, "raw_mill": {}, "kiln": {}, "production": {}}
+        for (group, field, _), value in zip(_STEP_FIELDS, rounded):
+            packet[group][field] = value
+        return packet
         
     def apply_optimizer_targets(self, targets):
         """Apply optimizer targets to the plant control system"""
@@ -1064,7 +1134,34 @@ ENGINEERING_LIMITS = {
     'lsf_predicted': (97.0, 99.0)  # LSF target range for optimal clinker quality
 }
 
+# Short-lived caches for Firebase-backed optimizer configuration
+SETTINGS_CACHE_TTL = 30.0  # seconds
+_APC_CACHE = {'ts': 0.0, 'data': None}
+_SETTINGS_CACHE = {'ts': 0.0, 'data': None}
+
+async def _cached_fetch(cache, fetch):
+    """Return cache['data'] if younger than SETTINGS_CACHE_TTL, otherwise refresh it via fetch()"""
+    if cache['data'] is not None and time.monotonic() - cache['ts'] < SETTINGS_CACHE_TTL:
+        return cache['data']
+    cache['data'] = await fetch()
+    cache['ts'] = time.monotonic()
+    return cache['data']
+
+def invalidate_settings_cache():
+    """Drop cached APC limits and optimizer settings so the next read hits Firebase"""
+    for cache in (_APC_CACHE, _SETTINGS_CACHE):
+        cache['data'] = None
+        cache['ts'] = 0.0
+
 async def fetch_apc_limits_from_firebase():
+    """Fetch APC limits, reusing the cached copy for up to SETTINGS_CACHE_TTL seconds"""
+    return await _cached_fetch(_APC_CACHE, _fetch_apc_limits_uncached)
+
+async def fetch_optimizer_settings_from_firebase():
+    """Fetch optimizer settings, reusing the cached copy for up to SETTINGS_CACHE_TTL seconds"""
+    return await _cached_fetch(_SETTINGS_CACHE, _fetch_optimizer_settings_uncached)
+
+async def _fetch_apc_limits_uncached():
     """Fetch APC limits from Firebase apclimits collection"""
     if db is None:
         print("⚠ Firebase not initialized, using default limits")
@@ -1072,7 +1169,7 @@ async def fetch_apc_limits_from_firebase():
     
     try:
         apc_limits = {}
-        docs = db.collection('apclimits').stream()
+        docs = await db_async.collection('apclimits').get()
         
         for doc in docs:
             data = doc.to_dict()
@@ -1095,15 +1192,15 @@ async def fetch_apc_limits_from_firebase():
         print(f"✗ Error fetching APC limits from Firebase: {e}")
         return {}
 
-async def fetch_optimizer_settings_from_firebase():
+async def _fetch_optimizer_settings_uncached():
     """Fetch optimizer settings (pricing and ML/FP ratio) from Firebase"""
     if db is None:
         print("⚠ Firebase not initialized, using default settings")
         return None, 0.3
     
     try:
-        settings_ref = db.collection('optimizer_settings').document('current')
-        settings_doc = settings_ref.get()
+        settings_ref = db_async.collection('optimizer_settings').document('current')
+        settings_doc = await settings_ref.get()
         
         if settings_doc.exists:
             settings_data = settings_doc.to_dict()
@@ -1160,31 +1257,107 @@ def calculate_economic_value(optimization_vars, pricing: PricingConfig):
     
     return economic_value
 
+# Sections of a plant data record, in lookup order
+PLANT_DATA_GROUPS = ('kpi', 'raw_mill', 'kiln', 'production')
+
+def extract_series(data, var):
+    """Collect one variable from a list of plant data records into a float array"""
+    vals = []
+    for d in data:
+        for group in PLANT_DATA_GROUPS:
+            if var in d.get(group, {}):
+                vals.append(d[group][var])
+                break
+    return np.asarray(vals, dtype=np.float64)
+
 def get_recent_data(n=50):
     with plant_data_lock:
         return plant_data_history[-n:] if len(plant_data_history) >= n else plant_data_history[:]
 
+# Worker threads for CPU-bound optimization runs (Optuna, sklearn and NumPy release the GIL
+# for most of their work, so threads keep the event loop free without pickling state)
+_OPT_POOL = ThreadPoolExecutor(max_workers=2)
+
+# Optuna studies persist across requests so TPE warm-starts from earlier trials
+_STUDY_STORAGE = optuna.storages.InMemoryStorage()
+_STUDY_LOCK = Lock()
+_STUDY_RUN_LOCKS = {}  # study name -> Lock held for a whole run on that study
+COLD_START_TRIALS = 100  # Trials for a study with no history
+WARM_START_TRIALS = 30   # Incremental trials once a study has history
+MAX_STUDY_TRIALS = 1000  # Start the study over beyond this (TPE cost grows with history)
+
+def persistent_study_name(segment, limit_type, limits_dict, constraint_limits, pricing):
+    """Name of the shared Optuna study for this segment, limit set and pricing"""
+    limits_hash = hashlib.sha1(repr((
+        sorted(limits_dict.items()),
+        sorted(constraint_limits.items()),
+        sorted(pricing.dict().items())
+    )).encode()).hexdigest()[:12]
+    return f"{segment}:{limit_type}:{limits_hash}"
+
+def study_run_lock(study_name):
+    """Per-study lock - concurrent requests on one study would mix their trials (or delete it mid-run)"""
+    with _STUDY_LOCK:
+        return _STUDY_RUN_LOCKS.setdefault(study_name, Lock())
+
+def get_persistent_study(study_name):
+    """Load (or create) the shared Optuna study - call with study_run_lock(study_name) held"""
+    def create():
+        return optuna.create_study(
+            study_name=study_name,
+            storage=_STUDY_STORAGE,
+            direction='maximize',
+            sampler=optuna.samplers.TPESampler(n_startup_trials=20, n_ei_candidates=30),
+            load_if_exists=True
+        )
+    
+    with _STUDY_LOCK:
+        study = create()
+        if len(study.get_trials(deepcopy=False)) >= MAX_STUDY_TRIALS:
+            optuna.delete_study(study_name=study_name, storage=_STUDY_STORAGE)
+            study = create()
+    return study
+
 async def optimize_with_limits(
     segment: str, 
-    n_data: int, 
+    data: List[Dict[str, Any]],
     limit_type: str,  # "apc" or "engineering"
     limits_dict: Dict[str, tuple],
     pricing: PricingConfig,
-    constraint_ranges: list = None
+    constraint_dict: Optional[Dict[str, tuple]] = None
+):
+    """Run optimization with specified limits (APC or Engineering) off the event loop
+    
+    Args:
+        data: Snapshot of recent plant data (see get_recent_data); the hybrid ML model
+              must already be trained on it so concurrent runs can share it read-only
+        constraint_dict: {variable: (min_value, max_value)} user constraint ranges
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _OPT_POOL, _optimize_sync,
+        segment, data, limit_type, limits_dict, pricing, constraint_dict
+    )
+
+def _optimize_sync(
+    segment: str, 
+    data: List[Dict[str, Any]],
+    limit_type: str,
+    limits_dict: Dict[str, tuple],
+    pricing: PricingConfig,
+    constraint_dict: Optional[Dict[str, tuple]] = None
 ):
-    """Run optimization with specified limits (APC or Engineering)"""
-    global plant_data_history, hybrid_model
+    """CPU-bound body of optimize_with_limits - runs in _OPT_POOL"""
+    global hybrid_model
     
     try:
-        data = get_recent_data(n_data)
         if not data:
-            return {"error": "Not enough plant data for optimization."}
-        
-        # Update ML model with latest data
-        hybrid_model.update_ml_model(data)
+            print(f"Optimization skipped ({limit_type}): not enough plant data")
+            return None, []
         
-        # Get current plant state
-        current_state = plant_simulator.step()
+        # Get current plant state - reuse the latest stored tick instead of stepping
+        # the simulator again (data is a snapshot taken under plant_data_lock)
+        current_state = data[-1]
         current_constraints = {
             'burning_zone_temp_c': current_state['kiln']['burning_zone_temp_c'],
             'kiln_motor_torque_pct': current_state['kiln']['kiln_motor_torque_pct'],
@@ -1201,109 +1374,112 @@ async def optimize_with_limits(
         
         variables = OPTIMIZER_VARIABLES[segment]
         
-        # Convert constraint ranges to dict for easy lookup
-        constraint_dict = {}
-        if constraint_ranges:
-            for cr in constraint_ranges:
-                constraint_dict[cr['variable']] = (cr['min_value'], cr['max_value'])
+        constraint_dict = constraint_dict or {}
+        
+        # Flatten plant data once for variables whose bounds come from history
+        flat = {
+            var: extract_series(data, var)
+            for var in variables['optimization'] if var not in limits_dict
+        }
+        
+        # Precompute search bounds for optimization variables (trial-independent)
+        bounds = {}
+        for var in variables['optimization']:
+            # Use provided limits (APC or Engineering)
+            if var in limits_dict:
+                bounds[var] = limits_dict[var]
+            elif flat[var].size:
+                bounds[var] = (float(flat[var].min()) * 0.9, float(flat[var].max()) * 1.1)
+            else:
+                # Fallback to engineering limits
+                bounds[var] = ENGINEERING_LIMITS.get(var, (0, 100))
+        
+        # Precompute limits for constraint variables
+        constraint_limits = {}
+        for var in variables['constraints']:
+            if var in limits_dict:
+                constraint_limits[var] = limits_dict[var]
+            elif var in constraint_dict:
+                constraint_limits[var] = constraint_dict[var]
+            else:
+                constraint_limits[var] = ENGINEERING_LIMITS.get(var, (0, 1000))
         
         # Trial history for plotting
         trial_history = []
         
-        # Define objective function
-        def objective(trial):
-            # Suggest values for optimization variables
-            optimization_vars = {}
-            for var in variables['optimization']:
-                # Use provided limits (APC or Engineering)
-                if var in limits_dict:
-                    low, high = limits_dict[var]
-                else:
-                    # Extract values based on variable location in data structure
-                    vals = []
-                    for d in data:
-                        val = None
-                        if var in d.get('kpi', {}):
-                            val = d['kpi'][var]
-                        elif var in d.get('raw_mill', {}):
-                            val = d['raw_mill'][var]
-                        elif var in d.get('kiln', {}):
-                            val = d['kiln'][var]
-                        elif var in d.get('production', {}):
-                            val = d['production'][var]
-                        
-                        if val is not None:
-                            vals.append(val)
-                    
-                    if vals:
-                        low, high = min(vals) * 0.9, max(vals) * 1.1
-                    else:
-                        # Fallback to engineering limits
-                        low, high = ENGINEERING_LIMITS.get(var, (0, 100))
-                
-                optimization_vars[var] = trial.suggest_float(var, low, high)
+        # Shared study - trial numbers continue from earlier requests. The run lock is held
+        # from load to best-trial selection so another request's trials can't interleave
+        study_name = persistent_study_name(segment, limit_type, limits_dict, constraint_limits, pricing)
+        with study_run_lock(study_name):
+            study = get_persistent_study(study_name)
+            trial_offset = len(study.get_trials(deepcopy=False))
+        
+            # Define objective function
+            def objective(trial):
+                # Suggest values for optimization variables
+                optimization_vars = {}
+                for var in variables['optimization']:
+                    low, high = bounds[var]
+                    optimization_vars[var] = trial.suggest_float(var, low, high)
             
-            # Use hybrid model to predict constraint responses for Clinkerization
-            constraint_penalty = 0
-            constraint_violations = []
-            predicted_constraints = {}
+                # Use hybrid model to predict constraint responses for Clinkerization
+                constraint_penalty = 0
+                constraint_violations = []
+                predicted_constraints = {}
             
-            if segment == 'Clinkerization':
-                # Pass current mill state for accurate LSF prediction
-                predicted_constraints = hybrid_model.predict_constraint_responses(
-                    optimization_vars, current_constraints, current_mill_state
-                )
+                if segment == 'Clinkerization':
+                    # Pass current mill state for accurate LSF prediction
+                    predicted_constraints = hybrid_model.predict_constraint_responses(
+                        optimization_vars, current_constraints, current_mill_state
+                    )
                 
-                # Check constraints against specified limits
-                for var in variables['constraints']:
-                    if var in predicted_constraints:
-                        predicted_value = predicted_constraints[var]
+                    # Check constraints against specified limits
+                    for var in variables['constraints']:
+                        if var in predicted_constraints:
+                            predicted_value = predicted_constraints[var]
                         
-                        # Get limit for this constraint
-                        if var in limits_dict:
-                            min_val, max_val = limits_dict[var]
-                        elif var in constraint_dict:
-                            min_val, max_val = constraint_dict[var]
-                        else:
-                            min_val, max_val = ENGINEERING_LIMITS.get(var, (0, 1000))
+                            min_val, max_val = constraint_limits[var]
                         
-                        # Check if constraint is violated
-                        if predicted_value < min_val or predicted_value > max_val:
-                            violation = max(min_val - predicted_value, predicted_value - max_val, 0)
-                            constraint_penalty += violation * 10  # Heavy penalty for violations
-                            constraint_violations.append(f"{var}: {predicted_value:.2f} (limit: [{min_val}, {max_val}])")
+                            # Check if constraint is violated
+                            if predicted_value < min_val or predicted_value > max_val:
+                                violation = max(min_val - predicted_value, predicted_value - max_val, 0)
+                                constraint_penalty += violation * 10  # Heavy penalty for violations
+                                constraint_violations.append(f"{var}: {predicted_value:.2f} (limit: [{min_val}, {max_val}])")
             
-            # Calculate economic value using pricing
-            economic_value = calculate_economic_value(optimization_vars, pricing)
+                # Calculate economic value using pricing
+                economic_value = calculate_economic_value(optimization_vars, pricing)
             
-            # Economic objective (maximize profit)
-            objective_score = economic_value - constraint_penalty
+                # Economic objective (maximize profit)
+                objective_score = economic_value - constraint_penalty
             
-            # Store trial history with variable values
-            trial_data = {
-                'trial': trial.number,
-                'economic_value': economic_value,
-                'constraint_penalty': constraint_penalty,
-                'objective_score': objective_score,
-                'optimization_vars': optimization_vars.copy()
-            }
+                # Store trial history with variable values
+                trial_data = {
+                    'trial': trial.number - trial_offset,
+                    'economic_value': economic_value,
+                    'constraint_penalty': constraint_penalty,
+                    'objective_score': objective_score,
+                    'optimization_vars': optimization_vars.copy()
+                }
             
-            # Add constraint predictions if available
-            if segment == 'Clinkerization' and predicted_constraints:
-                trial_data['constraint_vars'] = predicted_constraints.copy()
+                # Add constraint predictions if available
+                if segment == 'Clinkerization' and predicted_constraints:
+                    trial_data['constraint_vars'] = predicted_constraints.copy()
             
-            trial_history.append(trial_data)
+                trial_history.append(trial_data)
             
-            return objective_score
+                return objective_score
         
-        # Run optimization
-        study = optuna.create_study(
-            direction='maximize',
-            sampler=optuna.samplers.TPESampler(n_startup_trials=20, n_ei_candidates=30)
-        )
-        study.optimize(objective, n_trials=100, show_progress_bar=False)
+            # Run optimization - fewer trials once the study has history to learn from
+            n_trials = WARM_START_TRIALS if trial_offset else COLD_START_TRIALS
+            study.optimize(objective, n_trials=n_trials, show_progress_bar=False)
         
-        best_params = study.best_params
+            # Pick the best trial of this run (earlier trials saw a different plant state)
+            run_trials = [
+                t for t in study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))
+                if t.number >= trial_offset
+            ]
+            best_trial = max(run_trials, key=lambda t: t.value)
+            best_params = dict(best_trial.params)
         
         # Calculate final constraint responses and economic value
         soft_sensors = {}
@@ -1344,7 +1520,7 @@ async def optimize_with_limits(
             optimization_type=limit_type,
             suggested_targets=best_params,
             soft_sensors=soft_sensors,
-            optimization_score=study.best_value,
+            optimization_score=best_trial.value,
             economic_value=final_economic_value,
             constraint_violations=constraint_violations,
             model_type="hybrid_fp_ml"
@@ -1354,14 +1530,9 @@ async def optimize_with_limits(
         print(f"Optimization error ({limit_type}): {str(e)}")
         return None, []
 
-@app.post("/optimize_targets")
-async def optimize_targets_api_post(request: OptimizeRequest):
-    """
-    INTERNAL ENDPOINT - Called by optimizer worker only.
-    Run dual optimization with both APC limits and engineering limits.
-    Frontend should NOT call this directly - use GET endpoint instead.
-    """
-    global pricing_config, optimization_history, hybrid_model
+async def _run_dual_optimization(request: OptimizeRequest) -> DualOptimizationResponse:
+    """Run dual optimization with both APC limits and engineering limits"""
+    global pricing_config, hybrid_model
     
     # Fetch settings from Firebase (pricing and ML/FP ratio)
     firebase_pricing, ml_fp_ratio = await fetch_optimizer_settings_from_firebase()
@@ -1380,26 +1551,36 @@ async def optimize_targets_api_post(request: OptimizeRequest):
     # Fetch APC limits from Firebase
     apc_limits = await fetch_apc_limits_from_firebase()
     
-    # Run optimization with APC limits
-    print("Running optimization with APC limits...")
-    apc_result, apc_history = await optimize_with_limits(
-        segment=request.segment,
-        n_data=request.n_data,
-        limit_type="apc_limits",
-        limits_dict=apc_limits,
-        pricing=pricing,
-        constraint_ranges=[cr.dict() for cr in request.constraint_ranges] if request.constraint_ranges else None
-    )
-    
-    # Run optimization with Engineering limits
-    print("Running optimization with Engineering limits...")
-    eng_result, eng_history = await optimize_with_limits(
-        segment=request.segment,
-        n_data=request.n_data,
-        limit_type="engineering_limits",
-        limits_dict=ENGINEERING_LIMITS,
-        pricing=pricing,
-        constraint_ranges=[cr.dict() for cr in request.constraint_ranges] if request.constraint_ranges else None
+    # Snapshot plant data once so both runs see identical history
+    data = get_recent_data(request.n_data)
+    
+    # Update ML model with latest data before the two runs share it
+    if data:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_OPT_POOL, hybrid_model.update_ml_model, data)
+    
+    # Constraint ranges as a {variable: (min, max)} lookup, built once and shared by both runs
+    constraint_dict = {cr.variable: (cr.min_value, cr.max_value) for cr in request.constraint_ranges}
+    
+    # Run APC and Engineering optimizations concurrently
+    print("Running optimization with APC and Engineering limits...")
+    (apc_result, apc_history), (eng_result, eng_history) = await asyncio.gather(
+        optimize_with_limits(
+            segment=request.segment,
+            data=data,
+            limit_type="apc_limits",
+            limits_dict=apc_limits,
+            pricing=pricing,
+            constraint_dict=constraint_dict
+        ),
+        optimize_with_limits(
+            segment=request.segment,
+            data=data,
+            limit_type="engineering_limits",
+            limits_dict=ENGINEERING_LIMITS,
+            pricing=pricing,
+            constraint_dict=constraint_dict
+        )
     )
     
     # Store in global history
@@ -1412,35 +1593,31 @@ async def optimize_targets_api_post(request: OptimizeRequest):
             'apc_history': apc_history,
             'eng_history': eng_history
         })
-        
-        # Keep only last 100 optimization runs
-        if len(optimization_history) > 100:
-            optimization_history = optimization_history[-100:]
     
-    # Debug: Print first history item to verify structure
+    # Combined history for plotting - built once, APC trials first then Engineering
     combined_history = apc_history + eng_history
     if combined_history:
-        print(f"🔍 Backend Debug: First history item keys: {combined_history[0].keys()}")
-        print(f"🔍 Backend Debug: First history item: {combined_history[0]}")
+        logger.debug("🔍 First history item: %s", combined_history[0])
     
     # Prepare pricing details for response
-    pricing_details = {
-        'limestone_price_per_ton': pricing.limestone_price_per_ton,
-        'clay_price_per_ton': pricing.clay_price_per_ton,
-        'traditional_fuel_price_per_kg': pricing.traditional_fuel_price_per_kg,
-        'alternative_fuel_price_per_kg': pricing.alternative_fuel_price_per_kg,
-        'clinker_selling_price_per_ton': pricing.clinker_selling_price_per_ton,
-        'electricity_price_per_kwh': pricing.electricity_price_per_kwh,
-        'byproduct_credit_per_ton': pricing.byproduct_credit_per_ton
-    }
+    pricing_details = pricing.dict(include=PRICING_DETAIL_FIELDS)
     
     return DualOptimizationResponse(
         apc_optimization=apc_result,
         engineering_optimization=eng_result,
-        optimization_history=apc_history + eng_history,  # Combined history for plotting
+        optimization_history=combined_history,
         pricing_details=pricing_details
     )
 
+@app.post("/optimize_targets")
+async def optimize_targets_api_post(request: OptimizeRequest):
+    """
+    INTERNAL ENDPOINT - Called by optimizer worker only.
+    Run dual optimization with both APC limits and engineering limits.
+    Frontend should NOT call this directly - use GET endpoint instead.
+    """
+    return await _run_dual_optimization(request)
+
 @app.get("/optimize_targets")
 async def optimize_targets_api_get(segment: str = 'Clinkerization', n_data: int = 50):
     """
@@ -1452,28 +1629,26 @@ async def optimize_targets_api_get(segment: str = 'Clinkerization', n_data: int
     
     try:
         # Update optimizer state in Firebase to trigger worker
-        state_ref = db.collection('optimizer_state').document('current')
-        
         # Set timer to 0 to trigger immediate run
         update_data = {
             'running': True,
             'autoSchedule': True,
             'timer': 0,  # Set to 0 to trigger immediate optimization
-            'lastUpdateTime': int(time.time() * 1000),
+            'lastUpdateTime': time.time_ns() // 1_000_000,
             'segment': segment
         }
         
-        state_ref.set(update_data, merge=True)
+        await write_optimizer_state(update_data, merge=True)
         
-        print(f"🎯 Optimization triggered via GET endpoint: {update_data}")
+        logger.info("🎯 Optimization triggered via GET endpoint: %s", update_data)
         
         return {
             "status": "queued",
-            "message": f"Optimization request queued for {segment}. The background worker will process it within 10 seconds.",
-            "note": "Worker polls every 10 seconds and will run optimization when timer=0"
+            "message": f"Optimization request queued for {segment}. The background worker will pick it up as soon as the state change reaches it.",
+            "note": "Worker listens to optimizer_state/current and runs optimization when timer=0"
         }
     except Exception as e:
-        print(f"✗ Error triggering optimization: {e}")
+        logger.error("✗ Error triggering optimization: %s", e)
         return {"error": str(e)}
 
 @app.post("/update_pricing")
@@ -1496,6 +1671,15 @@ def get_pricing_api():
     """
     return pricing_config
 
+@app.post("/invalidate_settings_cache")
+def invalidate_settings_cache_api():
+    """
+    Force the next optimization to re-read APC limits and settings from Firebase.
+    Call after changing apclimits or optimizer_settings.
+    """
+    invalidate_settings_cache()
+    return {"status": "success", "message": "Settings cache invalidated"}
+
 @app.get("/optimization_history")
 def get_optimization_history_api():
     """
@@ -1504,7 +1688,7 @@ def get_optimization_history_api():
     with optimization_history_lock:
         return {
             "total_runs": len(optimization_history),
-            "history": optimization_history
+            "history": list(optimization_history)
         }
 
 @app.post("/apply_optimizer_targets")
@@ -1545,6 +1729,26 @@ def predict_cement_properties(input_data: PredictionInput):
     """
     return make_predictions(input_data)
 
+# (PredictionInput field, plant state group, plant state field) used to build model inputs
+_STATE_KEY_MAP = (
+    ('limestone_pct', 'raw_mill', 'limestone_feeder_pct'),
+    ('clay_pct', 'raw_mill', 'clay_feeder_pct'),
+    ('mill_power', 'raw_mill', 'mill_power_kwh_ton'),
+    ('mill_vibration', 'raw_mill', 'mill_vibration_mm_s'),
+    ('burning_zone_temp', 'kiln', 'burning_zone_temp_c'),
+    ('kiln_speed', 'kiln', 'kiln_speed_rpm'),
+    ('kiln_motor_torque', 'kiln', 'kiln_motor_torque_pct'),
+    ('o2_level', 'kiln', 'kiln_inlet_o2_pct'),
+    ('separator_speed', 'raw_mill', 'separator_speed_rpm'),
+    ('mill_throughput', 'raw_mill', 'mill_throughput_tph'),
+    ('clinker_temperature', 'production', 'clinker_temp_c'),
+    ('raw_mill_lsf', 'kpi', 'lsf'),  # Use current simulated LSF
+)
+
+def _flatten_state(state):
+    """Map a nested plant state packet onto flat PredictionInput field names"""
+    return {field: state[group][key] for field, group, key in _STATE_KEY_MAP}
+
 @app.get("/predict_from_current_state", response_model=PredictionResponse)
 def predict_from_current_plant_state():
     """
@@ -1552,22 +1756,9 @@ def predict_from_current_plant_state():
     """
     current_state = plant_simulator.step()
     
-    # Convert current plant state to prediction input with simulation values
-    prediction_input = PredictionInput(
-        limestone_pct=current_state['raw_mill']['limestone_feeder_pct'],
-        clay_feeder_pct=current_state['raw_mill']['clay_feeder_pct'],
-        mill_power=current_state['raw_mill']['mill_power_kwh_ton'],
-        mill_vibration=current_state['raw_mill']['mill_vibration_mm_s'],
-        burning_zone_temp=current_state['kiln']['burning_zone_temp_c'],
-        kiln_speed=current_state['kiln']['kiln_speed_rpm'],
-        kiln_motor_torque=current_state['kiln']['kiln_motor_torque_pct'],
-        o2_level=current_state['kiln']['kiln_inlet_o2_pct'],
-        separator_speed=current_state['raw_mill']['separator_speed_rpm'],
-        mill_throughput=current_state['raw_mill']['mill_throughput_tph'],
-        clinker_temperature=current_state['production']['clinker_temp_c'],
-        raw_mill_lsf=current_state['kpi']['lsf'],  # Use current simulated LSF
-        free_lime=1.2  # Default value, could be enhanced with simulation
-    )
+    # Convert current plant state to prediction input (free_lime keeps its default,
+    # could be enhanced with simulation)
+    prediction_input = PredictionInput.parse_obj(_flatten_state(current_state))
     
     return make_predictions(prediction_input)
 
@@ -1609,13 +1800,27 @@ def debug_models():
 # INTEGRATED OPTIMIZER WORKER
 # ============================================================
 
+# Strong references to in-flight background saves so they aren't garbage collected
+_background_saves = set()
+
+def _log_background_save(task):
+    """Done-callback for detached Firebase saves - surface errors instead of dropping them"""
+    _background_saves.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("⚠ Background Firebase save failed", exc_info=task.exception())
+
+def _save_and_flush(result, segment):
+    """Queue the result for Firebase and dispatch the write buffer right away"""
+    save_optimization_to_firebase_internal(result, segment)
+    flush_optimization_writes(wait=False)
+
 async def run_optimization_internal(segment: str):
     """
     Run optimization internally (same process)
-    Returns the optimization result
+    Returns the optimization result; the Firebase save runs detached in a worker thread
     """
     try:
-        print(f"🔧 Running optimization for {segment} internally...")
+        logger.info("🔧 Running optimization for %s internally...", segment)
         
         # Create the request object directly (no HTTP call needed - same process)
         request = OptimizeRequest(
@@ -1625,49 +1830,125 @@ async def run_optimization_internal(segment: str):
             constraint_ranges=[]
         )
         
-        # Call the optimization function directly
-        result = await optimize_targets_api_post(request)
-        
-        # Convert Pydantic model to dict if needed
-        if hasattr(result, 'dict'):
-            result_dict = result.dict()
-        elif hasattr(result, 'model_dump'):
-            result_dict = result.model_dump()
-        else:
-            result_dict = result
+        # Call the shared optimization coroutine directly (bypasses the route layer)
+        response = await _run_dual_optimization(request)
+        result_dict = response.dict()
         
-        print(f"✓ Optimization completed for {segment}")
+        logger.info("✓ Optimization completed for %s", segment)
         
-        # Save to Firebase
-        save_optimization_to_firebase_internal(result_dict, segment)
+        # Save to Firebase without holding up the caller
+        task = asyncio.create_task(asyncio.to_thread(_save_and_flush, result_dict, segment))
+        _background_saves.add(task)
+        task.add_done_callback(_log_background_save)
         return result_dict
         
     except Exception as e:
-        print(f"✗ Error running optimization: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("✗ Error running optimization: %s", e)
         return None
 
+# Buffered optimized_targets writes, committed together via WriteBatch
+FIRESTORE_BATCH_LIMIT = 500  # Max operations Firestore accepts per batch
+FIRESTORE_WRITE_RETRIES = 4  # Attempts per batch before the records are requeued
+_pending_optim_writes = []  # (doc_id, record) pairs
+_flush_lock = Lock()
+
+# Batch commits run off the event loop; a run produces one record every few minutes,
+# so two threads cover a commit plus a requeued retry
+_FS_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="firestore-write")
+_TRANSIENT_FIRESTORE_ERRORS = (
+    gcp_exceptions.Aborted,
+    gcp_exceptions.DeadlineExceeded,
+    gcp_exceptions.ServiceUnavailable,
+)
+
+def _commit_optimization_records(records):
+    """Commit one WriteBatch of (doc_id, record) pairs, retrying transient Firestore errors with exponential backoff
+    
+    Document IDs are fixed when the record is queued, so a retried or requeued batch
+    overwrites its own documents instead of adding duplicates.
+    """
+    collection = db.collection('optimized_targets')
+    for attempt in range(FIRESTORE_WRITE_RETRIES):
+        try:
+            batch = db.batch()
+            for doc_id, record in records:
+                batch.set(collection.document(doc_id), record)
+            batch.commit()
+            return len(records)
+        except _TRANSIENT_FIRESTORE_ERRORS as e:
+            if attempt == FIRESTORE_WRITE_RETRIES - 1:
+                raise
+            delay = 0.5 * (2 ** attempt)
+            logger.warning("⏳ Firestore batch commit failed (%s), retrying in %.1fs", type(e).__name__, delay)
+            time.sleep(delay)
+
+def _on_commit_done(records):
+    """Build a done-callback that logs the commit and requeues its records on transient failure"""
+    def callback(future):
+        error = future.exception()
+        if error is None:
+            logger.info("💾 Saved %d optimization record(s) to Firebase", len(records))
+            return
+        if not isinstance(error, _TRANSIENT_FIRESTORE_ERRORS):
+            # Permanent errors (invalid argument, oversized document...) would fail again on every flush
+            logger.error("⚠ Error saving %d optimization record(s) to Firebase: %s (dropped)", len(records), error)
+            return
+        with _flush_lock:
+            _pending_optim_writes[:0] = records
+        logger.error("⚠ Error saving %d optimization record(s) to Firebase: %s (requeued)", len(records), error)
+    return callback
+
+def flush_optimization_writes(wait=True):
+    """Dispatch pending optimized_targets records to _FS_POOL, one WriteBatch per 500 records.
+    
+    Returns the number of records dispatched. With wait=False this returns immediately,
+    so it is safe to call from the event loop. Batches that still fail with a transient
+    error go back on the queue and are retried on the next flush; others are dropped.
+    """
+    if not db:
+        return 0
+    
+    with _flush_lock:
+        pending = _pending_optim_writes[:]
+        _pending_optim_writes.clear()
+    
+    futures = []
+    for start in range(0, len(pending), FIRESTORE_BATCH_LIMIT):
+        chunk = pending[start:start + FIRESTORE_BATCH_LIMIT]
+        future = _FS_POOL.submit(_commit_optimization_records, chunk)
+        future.add_done_callback(_on_commit_done(chunk))
+        futures.append(future)
+    
+    if wait and futures:
+        wait_futures(futures)
+    return len(pending)
+
 def save_optimization_to_firebase_internal(result, segment):
-    """Save optimization results to Firebase optimized_targets collection"""
+    """Queue optimization results for the Firebase optimized_targets collection"""
     try:
         if not db:
-            print("⚠ Firebase not available, skipping save")
+            logger.warning("⚠ Firebase not available, skipping save")
             return
         
         # Convert optimization_history to a simple list if it exists
         opt_history = result.get('optimization_history', [])
         if opt_history and isinstance(opt_history, list):
+            # Coerce the three score columns to float in a single NumPy pass
+            scores = np.array([
+                (item.get('economic_value', 0), item.get('constraint_penalty', 0), item.get('objective_score', 0))
+                for item in opt_history
+            ], dtype=np.float64).tolist()
             opt_history = [
                 {
                     'trial': item.get('trial', idx + 1),
-                    'economic_value': float(item.get('economic_value', 0)),
-                    'constraint_penalty': float(item.get('constraint_penalty', 0)),
-                    'objective_score': float(item.get('objective_score', 0)),
+                    'economic_value': economic_value,
+                    'constraint_penalty': constraint_penalty,
+                    'objective_score': objective_score,
                     'optimization_vars': item.get('optimization_vars', {}),
                     'constraint_vars': item.get('constraint_vars', {})
                 }
-                for idx, item in enumerate(opt_history)
+                for idx, (item, (economic_value, constraint_penalty, objective_score))
+                in enumerate(zip(opt_history, scores))
             ]
         else:
             opt_history = []
@@ -1687,169 +1968,257 @@ def save_optimization_to_firebase_internal(result, segment):
             'optimization_history': opt_history
         }
         
-        db.collection('optimized_targets').add(optimization_record)
-        print(f"💾 Optimization results saved to Firebase (history: {len(opt_history)} trials)")
+        with _flush_lock:
+            _pending_optim_writes.append((f"{segment}_{time.time_ns()}", optimization_record))
+        logger.debug("💾 Optimization results queued for Firebase (history: %d trials)", len(opt_history))
     except Exception as e:
-        print(f"⚠ Error saving to Firebase: {e}")
+        logger.error("⚠ Error saving to Firebase: %s", e)
 
 # Global variables for logging throttling
 _last_heartbeat_log = 0
-_last_state_log = 0
-_last_check_log = 0
+
+# Cached optimizer_state/current document - most polls only need to re-check the timer
+STATE_CACHE_MAX_TTL = 60.0  # seconds
+_state_cache = {"value": None, "fetched_at": 0.0, "update_time": None}
+
+# Realtime listener on optimizer_state/current - while it is attached the cache is kept
+# current by pushed snapshots and the worker sleeps until a change or the timer is due
+_state_watch = None
+
+def optimizer_state_ref():
+    """Firestore reference to the optimizer_state/current document (sync client)"""
+    return db.collection('optimizer_state').document('current')
+
+def optimizer_state_ref_async():
+    """Firestore reference to the optimizer_state/current document (async client)"""
+    return db_async.collection('optimizer_state').document('current')
+
+async def get_optimizer_state(force: bool = False):
+    """
+    Return the optimizer_state/current dict (None if the document is missing).
+    Reuses the cached copy for min(timer / 6, STATE_CACHE_MAX_TTL) seconds unless force=True.
+    """
+    cached = _state_cache["value"]
+    if not force and cached is not None and _state_watch is not None:
+        return cached  # Snapshot listener keeps this up to date
+    if not force and cached is not None:
+        ttl = min(cached.get('timer', 300) / 6, STATE_CACHE_MAX_TTL)
+        if time.time() - _state_cache["fetched_at"] < ttl:
+            return cached
+    
+    state_doc = await optimizer_state_ref_async().get()
+    if not state_doc.exists:
+        _state_cache["value"] = None
+        _state_cache["update_time"] = None
+    elif cached is None or state_doc.update_time != _state_cache["update_time"]:
+        # update_time acts as an ETag - only re-parse the document when it changed
+        _state_cache["value"] = state_doc.to_dict()
+        _state_cache["update_time"] = state_doc.update_time
+    _state_cache["fetched_at"] = time.time()
+    return _state_cache["value"]
+
+async def write_optimizer_state(fields, merge: bool = False):
+    """
+    Write fields to optimizer_state/current (set with merge, or update) and
+    fold them into the cached state so the next poll sees local writes immediately.
+    """
+    state_ref = optimizer_state_ref_async()
+    if merge:
+        await state_ref.set(fields, merge=True)
+    else:
+        await state_ref.update(fields)
+    
+    if _state_cache["value"] is None or firestore.SERVER_TIMESTAMP in fields.values():
+        # Unknown base document or server-resolved values - refetch next time
+        _state_cache["value"] = None
+        _state_cache["fetched_at"] = 0.0
+        _state_cache["update_time"] = None
+    else:
+        _state_cache["value"] = {**_state_cache["value"], **fields}
+        _state_cache["fetched_at"] = time.time()
+
+def _start_state_listener(loop, state_changed):
+    """Attach an on_snapshot listener that refreshes _state_cache and wakes the worker.
+    
+    Firestore invokes the callback on its own thread, so the event is set via call_soon_threadsafe.
+    """
+    global _state_watch
+    
+    def on_state_snapshot(docs, changes, read_time):
+        doc = docs[0] if docs else None
+        if doc is not None and doc.exists:
+            _state_cache["value"] = doc.to_dict()
+            _state_cache["update_time"] = doc.update_time
+        else:
+            _state_cache["value"] = None
+            _state_cache["update_time"] = None
+        _state_cache["fetched_at"] = time.time()
+        loop.call_soon_threadsafe(state_changed.set)
+    
+    _state_watch = optimizer_state_ref().on_snapshot(on_state_snapshot)
+
+def _stop_state_listener():
+    """Detach the optimizer_state listener if one is attached"""
+    global _state_watch
+    if _state_watch is not None:
+        _state_watch.unsubscribe()
+        _state_watch = None
+
+def _seconds_until_due(state):
+    """Seconds until the optimizer timer in state expires, or None if nothing is scheduled"""
+    if not state or not state.get('running') or not state.get('autoSchedule'):
+        return None
+    last_update = state.get('lastUpdateTime')
+    if not last_update:
+        return 0.0
+    due_ms = last_update + state.get('timer', 300) * 1000
+    return max(due_ms - time.time_ns() // 1_000_000, 0) / 1000
+
+async def _wait_for_next_check(state_changed):
+    """Sleep until the state document changes or the optimizer timer is due"""
+    if _state_watch is None:
+        await asyncio.sleep(POLL_INTERVAL)
+        return
+    
+    await wait_for_state_change(state_changed, _seconds_until_due(_state_cache["value"]))
 
 async def check_and_run_optimization():
     """
     Check Firebase for optimization state and run if needed
     """
-    print(f"🔄 CHECK START - {time.strftime('%H:%M:%S')}")  # ALWAYS log, no throttling
-    
-    global background_optimization_state, _last_check_log, _last_state_log
+    logger.debug("🔄 Check start")
     
-    current = time.time()
+    global background_optimization_state
     
     try:
         if not db:
-            print("⚠ Firebase not connected - skipping optimization check")
+            logger.warning("⚠ Firebase not connected - skipping optimization check")
             return
         
-        print(f"✓ Firebase connected, fetching state...")
-        
-        # Get current optimizer state
-        state_ref = db.collection('optimizer_state').document('current')
-        state_doc = state_ref.get()
+        # Get current optimizer state (cached between polls)
+        state = await get_optimizer_state()
         
-        print(f"✓ State document fetched, exists={state_doc.exists}")
+        logger.debug("✓ State fetched, exists=%s", state is not None)
         
-        if not state_doc.exists:
-            print("⚠ optimizer_state/current document does not exist in Firebase")
+        if state is None:
+            logger.warning("⚠ optimizer_state/current document does not exist in Firebase")
             return
         
-        state = state_doc.to_dict()
-        print(f"✓ State loaded: {state}")
-        
         # Check if optimizer is enabled
         running = state.get('running', False)
         auto_schedule = state.get('autoSchedule', False)
         
-        print(f"✓ Checking: running={running}, autoSchedule={auto_schedule}")
-        
         if not running or not auto_schedule:
-            print(f"⏸️ Optimizer paused: running={running}, autoSchedule={auto_schedule}")
+            logger.debug("⏸️ Optimizer paused: running=%s, autoSchedule=%s", running, auto_schedule)
             return
         
-        print(f"✓ Optimizer is active, proceeding...")
-        
         segment = state.get('segment', 'Clinkerization')
         timer = state.get('timer', 300)  # Default 5 minutes
         last_update = state.get('lastUpdateTime')
         
-        print(f"✓ Config: segment={segment}, timer={timer}, lastUpdate={last_update}")
+        logger.debug("✓ Config: segment=%s, timer=%s, lastUpdate=%s", segment, timer, last_update)
         
         # Handle first run (no lastUpdateTime set yet)
         if last_update is None or last_update == 0:
-            print(f"🚀 First optimization run for {segment}...")
+            logger.info("🚀 First optimization run for %s...", segment)
             
             # Run optimization immediately
             result = await run_optimization_internal(segment)
             
             if result:
                 # Set initial timer and timestamp
-                state_ref.update({
+                await write_optimizer_state({
                     'timer': 300,  # Reset to 5 minutes
-                    'lastUpdateTime': int(time.time() * 1000)
+                    'lastUpdateTime': time.time_ns() // 1_000_000
                 })
                 background_optimization_state["last_run"] = time.time()
                 background_optimization_state["next_run"] = time.time() + 300
-                print(f"✓ First optimization completed, timer set to 300s")
+                logger.info("✓ First optimization completed, timer set to 300s")
             return
         
-        # Calculate elapsed time since last update
-        current_time = time.time() * 1000  # Convert to milliseconds
-        elapsed = (current_time - last_update) / 1000  # Convert to seconds
+        # Calculate elapsed time since last update (integer milliseconds)
+        elapsed_ms = time.time_ns() // 1_000_000 - last_update
         
-        print(f"✓ Time check: elapsed={elapsed:.0f}s, timer={timer}s")
+        logger.debug("✓ Time check: elapsed=%.0fs, timer=%ss", elapsed_ms / 1000, timer)
         
         # Update next run time for status endpoint
         background_optimization_state["next_run"] = (last_update / 1000) + timer
         
         # Check if timer has expired (or is set to 0 for immediate run)
-        if elapsed >= timer:
-            print(f"⏰ Timer expired ({elapsed:.0f}s >= {timer}s)! Running optimization for {segment}...")
+        if elapsed_ms >= timer * 1000:
+            logger.info("⏰ Timer expired (%.0fs >= %ss)! Running optimization for %s...", elapsed_ms / 1000, timer, segment)
             
             # Run optimization
             result = await run_optimization_internal(segment)
             
             if result:
                 # Reset timer and update last run time
-                state_ref.update({
+                await write_optimizer_state({
                     'timer': timer,
-                    'lastUpdateTime': int(time.time() * 1000)
+                    'lastUpdateTime': time.time_ns() // 1_000_000
                 })
                 background_optimization_state["last_run"] = time.time()
                 background_optimization_state["next_run"] = time.time() + timer
-                print(f"✓ Optimization completed and timer reset to {timer}s")
+                logger.info("✓ Optimization completed and timer reset to %ss", timer)
             else:
-                print(f"✗ Optimization failed, will retry in {timer}s")
+                logger.warning("✗ Optimization failed, will retry in %ss", timer)
                 # Still update the timer to avoid rapid retries
-                state_ref.update({
-                    'lastUpdateTime': int(time.time() * 1000)
+                await write_optimizer_state({
+                    'lastUpdateTime': time.time_ns() // 1_000_000
                 })
     except Exception as e:
-        print(f"✗ Error in optimization check: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("✗ Error in optimization check: %s", e)
 
 async def optimizer_worker_loop():
-    """Background task that polls for optimization requests every 10 seconds"""
+    """Background task that runs optimization when the timer in optimizer_state/current is due"""
     global _last_heartbeat_log
     
-    print("=" * 60)
-    print("🤖 Integrated Optimizer Worker Started")
-    print("=" * 60)
-    print("👀 Watching for optimization requests...")
-    print("Polling interval: 10 seconds")
-    print(f"Firebase connected: {db is not None}")
-    print()
+    logger.info("🤖 Integrated Optimizer Worker Started (Firebase connected: %s)", db is not None)
+    state_changed = asyncio.Event()
     
     # Initial Firebase check
     if db is not None:
         try:
-            state_ref = db.collection('optimizer_state').document('current')
-            state_doc = state_ref.get()
-            if state_doc.exists:
-                state = state_doc.to_dict()
-                print(f"📋 Initial optimizer_state: running={state.get('running')}, autoSchedule={state.get('autoSchedule')}, timer={state.get('timer')}")
+            state = await get_optimizer_state(force=True)
+            if state is not None:
+                logger.info("📋 Initial optimizer_state: running=%s, autoSchedule=%s, timer=%s",
+                            state.get('running'), state.get('autoSchedule'), state.get('timer'))
             else:
-                print("⚠ WARNING: optimizer_state/current document does not exist!")
-                print("   Please create it in Firebase with: {running: true, autoSchedule: true, timer: 300, segment: 'Clinkerization'}")
+                logger.warning("⚠ optimizer_state/current document does not exist! Please create it in Firebase with: "
+                               "{running: true, autoSchedule: true, timer: 300, segment: 'Clinkerization'}")
+        except Exception as e:
+            logger.error("⚠ Error checking initial state: %s", e)
+        
+        try:
+            _start_state_listener(asyncio.get_running_loop(), state_changed)
+            logger.info("👀 Listening for optimizer_state changes")
         except Exception as e:
-            print(f"⚠ Error checking initial state: {e}")
+            logger.warning("⚠ Could not attach state listener, polling every %.0fs instead: %s", POLL_INTERVAL, e)
     else:
-        print("⚠ WARNING: Firebase not initialized - optimizer will not run")
+        logger.warning("⚠ Firebase not initialized - optimizer will not run")
     
-    print()
     _last_heartbeat_log = time.time()
     
-    while True:
-        try:
-            # Heartbeat every 30 seconds to confirm worker is alive
-            current = time.time()
-            if current - _last_heartbeat_log >= 30:
-                print(f"💓 Worker heartbeat - {time.strftime('%H:%M:%S')}")
-                _last_heartbeat_log = current
-            
-            print(f"🔵 About to call check_and_run_optimization...")
-            await check_and_run_optimization()
-            print(f"🟢 check_and_run_optimization completed")
-            await asyncio.sleep(10)  # Check every 10 seconds
-        except asyncio.CancelledError:
-            print("🛑 Optimizer worker cancelled")
-            break
-        except Exception as e:
-            print(f"❌ Error in optimizer worker: {e}")
-            import traceback
-            traceback.print_exc()
-            await asyncio.sleep(10)  # Wait before retrying
+    try:
+        while True:
+            try:
+                # Heartbeat every 30 seconds to confirm worker is alive
+                current = time.time()
+                if current - _last_heartbeat_log >= 30:
+                    logger.info("💓 Worker heartbeat")
+                    _last_heartbeat_log = current
+                
+                await check_and_run_optimization()
+                flush_optimization_writes(wait=False)
+                await _wait_for_next_check(state_changed)
+            except asyncio.CancelledError:
+                logger.info("🛑 Optimizer worker cancelled")
+                break
+            except Exception as e:
+                logger.exception("❌ Error in optimizer worker: %s", e)
+                await asyncio.sleep(POLL_INTERVAL)  # Wait before retrying
+    finally:
+        _stop_state_listener()
 
 # ============================================================
 # API ENDPOINTS
@@ -1876,6 +2245,33 @@ background_optimization_state = {
     "next_run": None
 }
 
+# Status reads arriving within this window share one Firestore fetch
+STATUS_COALESCE_WINDOW = 0.5  # seconds
+_status_fetch = {"task": None, "started_at": 0.0}
+
+def _worker_task_active() -> bool:
+    """True while the optimizer worker task exists and hasn't finished"""
+    return background_task is not None and not background_task.done()
+
+async def _read_state_dict():
+    """optimizer_state/current as a plain dict ({} if missing)"""
+    state_doc = await optimizer_state_ref_async().get()
+    return state_doc.to_dict() if state_doc.exists else {}
+
+async def _fetch_status_state():
+    """State for /optimizer_status - served from the listener cache when attached,
+    otherwise one fetch is shared by every call within STATUS_COALESCE_WINDOW"""
+    if _state_watch is not None and _state_cache["value"] is not None:
+        return dict(_state_cache["value"])
+    
+    task = _status_fetch["task"]
+    if task is None or time.monotonic() - _status_fetch["started_at"] >= STATUS_COALESCE_WINDOW:
+        task = asyncio.ensure_future(_read_state_dict())
+        _status_fetch["task"] = task
+        _status_fetch["started_at"] = time.monotonic()
+    # Shield so one cancelled request doesn't cancel the fetch other callers are awaiting
+    return await asyncio.shield(task)
+
 @app.post("/start_background_optimization")
 async def start_background_optimization(segment: str = "Clinkerization"):
     """Start background optimization scheduler - can be called from frontend"""
@@ -1886,18 +2282,17 @@ async def start_background_optimization(segment: str = "Clinkerization"):
         optimizer_enabled = True
         
         # Start background task if not already running
-        if background_task is None or background_task.done():
+        if not _worker_task_active():
             background_task = asyncio.create_task(optimizer_worker_loop())
-            print("✓ Optimizer worker started")
+            logger.info("✓ Optimizer worker started")
         
         # Update Firebase state if available
         if db is not None:
-            state_ref = db.collection('optimizer_state').document('current')
-            state_ref.set({
+            await write_optimizer_state({
                 'running': True,
                 'autoSchedule': True,
                 'timer': 300,
-                'lastUpdateTime': int(time.time() * 1000),
+                'lastUpdateTime': time.time_ns() // 1_000_000,
                 'segment': segment
             }, merge=True)
         
@@ -1911,7 +2306,7 @@ async def start_background_optimization(segment: str = "Clinkerization"):
             "segment": segment
         }
     except Exception as e:
-        print(f"Error starting optimizer: {e}")
+        logger.error("Error starting optimizer: %s", e)
         return {"error": str(e)}
 
 @app.post("/stop_background_optimization")
@@ -1924,24 +2319,26 @@ async def stop_background_optimization():
         optimizer_enabled = False
         
         # Cancel background task
-        if background_task and not background_task.done():
+        if _worker_task_active():
             background_task.cancel()
             try:
                 await background_task
             except asyncio.CancelledError:
-                print("✓ Optimizer worker stopped")
+                logger.info("✓ Optimizer worker stopped")
             background_task = None
         
         # Update Firebase state if available
         if db is not None:
-            state_ref = db.collection('optimizer_state').document('current')
-            state_ref.set({
+            await write_optimizer_state({
                 'running': False,
                 'autoSchedule': False,
                 'timer': 300,
-                'lastUpdateTime': int(time.time() * 1000)
+                'lastUpdateTime': time.time_ns() // 1_000_000
             }, merge=True)
         
+        # The worker loop no longer flushes, so commit anything still buffered
+        flush_optimization_writes(wait=False)
+        
         background_optimization_state["running"] = False
         
         return {
@@ -1950,31 +2347,26 @@ async def stop_background_optimization():
             "optimizer_running": False
         }
     except Exception as e:
-        print(f"Error stopping optimizer: {e}")
+        logger.error("Error stopping optimizer: %s", e)
         return {"error": str(e)}
 
 @app.get("/optimizer_status")
 async def get_optimizer_status():
     """Get current optimizer status - useful for frontend to check state"""
-    global background_task, optimizer_enabled, background_optimization_state
-    
-    is_running = background_task is not None and not background_task.done() and optimizer_enabled
+    task_active = _worker_task_active()
     
     # Get Firebase state if available
     firebase_state = {}
     if db is not None:
         try:
-            state_ref = db.collection('optimizer_state').document('current')
-            state_doc = state_ref.get()
-            if state_doc.exists:
-                firebase_state = state_doc.to_dict()
+            firebase_state = await _fetch_status_state()
         except Exception as e:
-            print(f"Error fetching Firebase state: {e}")
+            logger.warning("Error fetching Firebase state: %s", e)
     
     return {
-        "optimizer_running": is_running,
+        "optimizer_running": task_active and optimizer_enabled,
         "optimizer_enabled": optimizer_enabled,
-        "background_task_active": background_task is not None and not background_task.done(),
+        "background_task_active": task_active,
         "last_run": background_optimization_state.get("last_run"),
         "next_run": background_optimization_state.get("next_run"),
         "firebase_state": firebase_state
@@ -1986,9 +2378,9 @@ async def trigger_optimization_now(segment: str = "Clinkerization"):
     global background_optimization_state
     
     try:
-        print(f"🔥 Manual optimization trigger for {segment}...")
+        logger.info("🔥 Manual optimization trigger for %s...", segment)
         
-        # Run optimization immediately
+        # Run optimization immediately - don't wait for the worker's next cycle to persist it
         result = await run_optimization_internal(segment)
         
         if result:
@@ -1996,9 +2388,8 @@ async def trigger_optimization_now(segment: str = "Clinkerization"):
             
             # Update Firebase state
             if db is not None:
-                state_ref = db.collection('optimizer_state').document('current')
-                state_ref.update({
-                    'lastUpdateTime': int(time.time() * 1000),
+                await write_optimizer_state({
+                    'lastUpdateTime': time.time_ns() // 1_000_000,
                     'timer': 300  # Reset timer
                 })
             
@@ -2013,7 +2404,7 @@ async def trigger_optimization_now(segment: str = "Clinkerization"):
                 "message": "Optimization failed"
             }
     except Exception as e:
-        print(f"Error in manual optimization: {e}")
+        logger.error("Error in manual optimization: %s", e)
         return {"error": str(e)}
 
 @app.get("/check_and_run_optimization")
@@ -2024,8 +2415,7 @@ async def check_and_run_optimization_endpoint():
     
     try:
         # Get current optimizer state
-        state_ref = db.collection('optimizer_state').document('current')
-        state_doc = state_ref.get()
+        state_doc = await optimizer_state_ref_async().get()
         
         if not state_doc.exists:
             return {"status": "no_state", "message": "No optimizer state found"}
@@ -2057,7 +2447,7 @@ async def check_and_run_optimization_endpoint():
                 result = await optimize_targets_api_get(segment)
                 
                 # Reset timer
-                state_ref.update({
+                await write_optimizer_state({
                     'timer': 300,
                     'lastUpdateTime': firestore.SERVER_TIMESTAMP
                 })
@@ -2123,21 +2513,23 @@ async def split_dataset_endpoint(
     target_column: str,
     test_size: float = 0.2,
     random_state: int = 42,
-    feature_columns: Optional[List[str]] = None
+    feature_columns: Optional[List[str]] = None,
+    use_float32: bool = False
 ):
     """Split dataset into train/test sets"""
-    return split_dataset(session_id, target_column, test_size, random_state, feature_columns)
+    return split_dataset(session_id, target_column, test_size, random_state, feature_columns, use_float32)
 
 @app.post("/ml/train_model")
 async def train_model_endpoint(
     session_id: str,
     model_type: str,
-    hyperparameters: Optional[Dict[str, Any]] = None
+    hyperparameters: Optional[Dict[str, Any]] = None,
+    compute_train: bool = False
 ):
     """Train a machine learning model"""
     if hyperparameters is None:
         hyperparameters = {}
-    return train_model(session_id, model_type, **hyperparameters)
+    return train_model(session_id, model_type, compute_train=compute_train, **hyperparameters)
 
 @app.post("/ml/tune_hyperparameters")
 async def tune_hyperparameters_endpoint(
@@ -2167,8 +2559,16 @@ async def download_model_endpoint(
     model_name: str,
     format: str = "joblib"
 ):
-    """Download trained model"""
-    return download_model(session_id, model_name, format)
+    """Download trained model as a binary file"""
+    result = download_model(session_id, model_name, format)
+    if "error" in result:
+        return result
+    
+    return StreamingResponse(
+        io.BytesIO(result["content"]),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{result["filename"]}"'}
+    )
 
 @app.get("/ml/model_summary")
 async def model_summary_endpoint(session_id: str):
@@ -8,6 +8,13 @@ import joblib
 import pickle
 import io
 import base64
+import hashlib
+import math
+import os
+import atexit
+import shutil
+import tempfile
+from collections import OrderedDict
 from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 import json
@@ -15,15 +22,23 @@ import json
 # ML Libraries
 from sklearn.model_selection import train_test_split, cross_val_score, KFold
 from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.impute import SimpleImputer
 from sklearn.linear_model import LinearRegression, Ridge, Lasso, ElasticNet
 from sklearn.tree import DecisionTreeRegressor
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, AdaBoostRegressor
 from sklearn.metrics import (
-    mean_squared_error, mean_absolute_error, r2_score,
+    r2_score,
     accuracy_score, precision_score, recall_score, f1_score,
     classification_report, confusion_matrix
 )
 
+# Fast CSV ingest (optional - falls back to pandas' parser)
+try:
+    import pyarrow.csv as pacsv
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
 # Advanced ML
 
 # Hyperparameter tuning
@@ -33,29 +48,267 @@ try:
 except ImportError:
     HAS_OPTUNA = False
 
+# JIT-compiled numeric kernels (optional - NumPy fallbacks below)
+try:
+    import numba
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
 # Visualization (disabled to reduce deployment size)
 HAS_MATPLOTLIB = False
 HAS_SEABORN = False
 
 
+def _reg_metrics_kernel(y_true, y_pred):
+    """(rmse, mae, r2) in one pass over the residuals - compiled with numba when available"""
+    n = y_true.size
+    mean = y_true.mean()
+    ss_res = 0.0
+    abs_sum = 0.0
+    ss_tot = 0.0
+    for i in range(n):
+        d = y_true[i] - y_pred[i]
+        ss_res += d * d
+        abs_sum += abs(d)
+        ss_tot += (y_true[i] - mean) ** 2
+    if ss_tot == 0.0:
+        r2 = 1.0 if ss_res == 0.0 else 0.0  # Same convention as sklearn's r2_score
+    else:
+        r2 = 1.0 - ss_res / ss_tot
+    return math.sqrt(ss_res / n), abs_sum / n, r2
+
+def _high_corr_pairs_kernel(arr, threshold):
+    """(i, j, value) arrays for upper-triangle entries with |value| > threshold - compiled with numba"""
+    c = arr.shape[0]
+    size = c * (c - 1) // 2
+    i_out = np.empty(size, np.int64)
+    j_out = np.empty(size, np.int64)
+    v_out = np.empty(size, np.float64)
+    k = 0
+    for i in range(c):
+        for j in range(i + 1, c):
+            v = arr[i, j]
+            if abs(v) > threshold:
+                i_out[k] = i
+                j_out[k] = j
+                v_out[k] = v
+                k += 1
+    return i_out[:k], j_out[:k], v_out[:k]
+
+def _high_corr_pairs_numpy(arr, threshold):
+    """Vectorized fallback for _high_corr_pairs_kernel"""
+    rows, cols = np.triu_indices_from(arr, k=1)
+    values = arr[rows, cols]
+    mask = np.abs(values) > threshold
+    return rows[mask], cols[mask], values[mask]
+
+def _reg_metrics_numpy(y_true, y_pred):
+    """Vectorized fallback for _reg_metrics_kernel"""
+    resid = y_true - y_pred
+    ss_res = float(resid @ resid)
+    ss_tot = float(((y_true - y_true.mean()) ** 2).sum())
+    if ss_tot == 0.0:
+        r2 = 1.0 if ss_res == 0.0 else 0.0
+    else:
+        r2 = 1.0 - ss_res / ss_tot
+    return math.sqrt(ss_res / y_true.size), float(np.abs(resid).mean()), r2
+
+if HAS_NUMBA:
+    _reg_metrics = numba.njit(cache=True, fastmath=True)(_reg_metrics_kernel)
+    _high_corr_pairs = numba.njit(cache=True)(_high_corr_pairs_kernel)
+    # Compile at import so the first request doesn't pay for it
+    _reg_metrics(np.zeros(2), np.ones(2))
+    _high_corr_pairs(np.eye(2), 0.7)
+else:
+    _reg_metrics = _reg_metrics_numpy
+    _high_corr_pairs = _high_corr_pairs_numpy
+
+def regression_metrics(y_true, y_pred) -> Dict[str, float]:
+    """RMSE, MAE and R2 for a set of predictions"""
+    rmse, mae, r2 = _reg_metrics(
+        np.ascontiguousarray(y_true, dtype=np.float64),
+        np.ascontiguousarray(y_pred, dtype=np.float64)
+    )
+    return {"rmse": float(rmse), "mae": float(mae), "r2": float(r2)}
+
+
+# Estimators available to train_model, instantiated on demand with the caller's kwargs
+MODEL_CLASSES = {
+    "linear_regression": LinearRegression,
+    "ridge": Ridge,
+    "lasso": Lasso,
+    "elastic_net": ElasticNet,
+    "decision_tree": DecisionTreeRegressor,
+    "random_forest": RandomForestRegressor,
+    "gradient_boosting": GradientBoostingRegressor,
+    "adaboost": AdaBoostRegressor,
+}
+
+# Files the ML builder keeps across restarts (the Optuna journal), outside the source tree
+OPTEX_DATA_DIR = Path(os.environ.get("OPTEX_DATA_DIR", Path.home() / ".optex"))
+
+# Tuning studies persist here so retunes resume from earlier trials (shared across restarts)
+OPTUNA_JOURNAL_PATH = os.environ.get("OPTUNA_JOURNAL_PATH", str(OPTEX_DATA_DIR / "optuna_journal.log"))
+# The journal is append-only and replayed on open, so past this size it is rotated to .old
+OPTUNA_JOURNAL_MAX_BYTES = int(os.environ.get("OPTUNA_JOURNAL_MAX_BYTES", 64 * 1024 * 1024))
+_tuning_storage = None
+
+def get_tuning_storage():
+    """Journal-file Optuna storage for tune_hyperparameters, created on first use"""
+    global _tuning_storage
+    if _tuning_storage is None:
+        journal = Path(OPTUNA_JOURNAL_PATH)
+        journal.parent.mkdir(parents=True, exist_ok=True)
+        if journal.exists() and journal.stat().st_size > OPTUNA_JOURNAL_MAX_BYTES:
+            # Sessions live in memory, so after a restart most of these studies are unreachable anyway
+            journal.replace(journal.with_name(journal.name + ".old"))
+            print(f"✓ Rotated Optuna journal over {OPTUNA_JOURNAL_MAX_BYTES // (1024 * 1024)} MB: {journal}")
+        _tuning_storage = optuna.storages.JournalStorage(
+            optuna.storages.JournalFileStorage(OPTUNA_JOURNAL_PATH)
+        )
+    return _tuning_storage
+
+# Number of features reported in train_model's feature_importance ranking
+TOP_FEATURES = 10
+
+# Estimators that fit in parallel - default to all cores unless the caller sets n_jobs
+PARALLEL_MODELS = {"random_forest"}
+
+# Sessions whose frames (dataset + train/test split) stay in memory at once; the least
+# recently used beyond this are pickled to disk on eviction and reloaded on next access
+MAX_RESIDENT_DATASETS = 4
+_spill_dir: Optional[Path] = None
+
+def _get_spill_dir() -> Path:
+    """Private (0700) per-process directory for spilled frames, created on first spill and removed at exit"""
+    global _spill_dir
+    if _spill_dir is None:
+        # mkdtemp, not a fixed name: spill files are unpickled, so no other user may plant them
+        _spill_dir = Path(tempfile.mkdtemp(prefix="optex_ml_datasets_"))
+        atexit.register(shutil.rmtree, _spill_dir, ignore_errors=True)
+    return _spill_dir
+
+# Sessions whose frames are currently in memory, least recently used first
+_resident_sessions: "OrderedDict[str, MLSession]" = OrderedDict()
+
+def _touch_resident(session: "MLSession"):
+    """Mark a session's frames as recently used and spill the oldest beyond MAX_RESIDENT_DATASETS"""
+    _resident_sessions[session.session_id] = session
+    _resident_sessions.move_to_end(session.session_id)
+    while len(_resident_sessions) > MAX_RESIDENT_DATASETS:
+        _, oldest = _resident_sessions.popitem(last=False)
+        oldest._spill()
+
+def _frame_property(name: str) -> property:
+    """Session attribute stored in MLSession._frames, so it is spilled and reloaded with the dataset"""
+    return property(lambda self: self._frame(name), lambda self, value: self._set_frame(name, value))
+
 # Session storage for datasets and models
 class MLSession:
     """Manages ML session data for a user"""
     def __init__(self, session_id: str):
         self.session_id = session_id
-        self.dataset: Optional[pd.DataFrame] = None
+        # dataset, X_train, X_test, y_train, y_test while in memory; pickled to _spill_path on eviction
+        self._frames: Dict[str, Any] = {}
+        self._spill_path: Optional[Path] = None
+        self._spilled_names: frozenset = frozenset()  # Keys of _frames while they sit in _spill_path
+        self.dataset_shape: Optional[Tuple[int, int]] = None
         self.dataset_name: str = ""
-        self.X_train: Optional[pd.DataFrame] = None
-        self.X_test: Optional[pd.DataFrame] = None
-        self.y_train: Optional[pd.Series] = None
-        self.y_test: Optional[pd.Series] = None
+        self.dataset_nbytes: int = 0
+        self.numeric_cols: List[str] = []
+        self.categorical_cols: List[str] = []
         self.target_column: Optional[str] = None
         self.feature_columns: List[str] = []
         self.scaler: Optional[StandardScaler] = None
+        self.imputer: Optional[SimpleImputer] = None  # Column means fitted at split time
         self.models: Dict[str, Any] = {}
         self.model_results: Dict[str, Dict] = {}
         self.best_model_name: Optional[str] = None
-        
+        # Results of full-table scans, valid until load_dataset replaces the dataset
+        self._analysis_cache: Optional[Dict] = None
+        self._correlation_cache: Optional[Dict] = None
+        self._corr: Optional[np.ndarray] = None  # float64 correlation matrix over numeric_cols
+        # Column store: float64 arrays (NaN for missing) built on first access per column
+        self.columns: Dict[str, np.ndarray] = {}
+    
+    X_train = _frame_property("X_train")
+    X_test = _frame_property("X_test")
+    y_train = _frame_property("y_train")
+    y_test = _frame_property("y_test")
+    
+    @property
+    def has_dataset(self) -> bool:
+        """Whether a dataset is loaded (in memory or spilled), without reloading it"""
+        return self.dataset_shape is not None
+    
+    @property
+    def split_done(self) -> bool:
+        """Whether split_dataset has stored X_train (in memory or spilled), without reloading it"""
+        return "X_train" in self._frames or "X_train" in self._spilled_names
+    
+    def _frame(self, name: str) -> Any:
+        if self._spill_path is not None:
+            self._unspill()
+        value = self._frames.get(name)
+        if value is not None:
+            _touch_resident(self)
+        return value
+    
+    def _set_frame(self, name: str, value: Any):
+        if self._spill_path is not None:
+            self._unspill()
+        if value is None:
+            self._frames.pop(name, None)
+        else:
+            self._frames[name] = value
+        if self._frames:
+            _touch_resident(self)
+        else:
+            _resident_sessions.pop(self.session_id, None)
+    
+    def _spill(self):
+        """Pickle the in-memory frames to disk and drop them (LRU eviction)"""
+        if not self._frames:
+            return
+        try:
+            # session_id comes from the client, so hash it rather than use it as a path
+            path = _get_spill_dir() / f"{hashlib.sha1(self.session_id.encode()).hexdigest()}.pkl"
+            pd.to_pickle(self._frames, path, protocol=5)
+        except Exception as e:
+            # The frames just stay in memory
+            print(f"⚠ Could not spill dataset for session {self.session_id}: {e}")
+            return
+        self._spill_path = path
+        self._spilled_names = frozenset(self._frames)
+        self._frames = {}
+        self.columns = {}
+    
+    def _unspill(self):
+        """Reload frames spilled by _spill"""
+        path, self._spill_path = self._spill_path, None
+        self._spilled_names = frozenset()
+        self._frames = pd.read_pickle(path)
+        path.unlink(missing_ok=True)
+    
+    def column_array(self, name: str) -> np.ndarray:
+        """Contiguous float64 array for a numeric column, cached until the dataset changes or is spilled"""
+        arr = self.columns.get(name)
+        if arr is None:
+            arr = np.ascontiguousarray(self.dataset[name].to_numpy(dtype=np.float64, na_value=np.nan))
+            self.columns[name] = arr
+        return arr
+    
+    @property
+    def dataset(self) -> Optional[pd.DataFrame]:
+        return self._frame("dataset")
+    
+    @dataset.setter
+    def dataset(self, df: Optional[pd.DataFrame]):
+        self._set_frame("dataset", df)
+        self.columns = {}
+        self.dataset_shape = df.shape if df is not None else None
+
 # Global session storage (in production, use Redis or database)
 sessions: Dict[str, MLSession] = {}
 
@@ -79,7 +332,12 @@ def load_dataset(session_id: str, data: Any, filename: str) -> Dict:
             file_obj = data
             
         # Read based on file extension
-        if filename.endswith('.csv'):
+        if filename.endswith('.csv') and HAS_PYARROW:
+            # Multi-threaded Arrow parser; converted to NumPy-backed columns so
+            # select_dtypes and the sklearn pipeline see the usual dtypes
+            table = pacsv.read_csv(file_obj, read_options=pacsv.ReadOptions(use_threads=True))
+            df = table.to_pandas()
+        elif filename.endswith('.csv'):
             df = pd.read_csv(file_obj)
         elif filename.endswith(('.xls', '.xlsx')):
             df = pd.read_excel(file_obj)
@@ -90,6 +348,13 @@ def load_dataset(session_id: str, data: Any, filename: str) -> Dict:
         
         session.dataset = df
         session.dataset_name = filename
+        session.dataset_nbytes = int(df.memory_usage(deep=True).sum())
+        session.numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+        session.categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+        session.imputer = None
+        session._analysis_cache = None
+        session._correlation_cache = None
+        session._corr = None
         
         return {
             "success": True,
@@ -98,46 +363,101 @@ def load_dataset(session_id: str, data: Any, filename: str) -> Dict:
             "columns": len(df.columns),
             "column_names": df.columns.tolist(),
             "dtypes": df.dtypes.astype(str).to_dict(),
-            "memory_usage": f"{df.memory_usage(deep=True).sum() / 1024:.2f} KB"
+            "memory_usage": f"{session.dataset_nbytes / 1024:.2f} KB"
         }
     except Exception as e:
         return {"error": f"Failed to load dataset: {str(e)}"}
 
+def _matrix_payload(frame: pd.DataFrame) -> Dict[str, list]:
+    """Row-major {"index", "columns", "values"} form of a table - one tolist() instead of a dict per cell"""
+    return {
+        "index": frame.index.tolist(),
+        "columns": frame.columns.tolist(),
+        "values": frame.to_numpy().tolist()
+    }
+
 def analyze_dataset(session_id: str) -> Dict:
     """Comprehensive dataset analysis"""
     session = get_session(session_id)
     
-    if session.dataset is None:
+    if not session.has_dataset:
         return {"error": "No dataset loaded. Please upload a dataset first."}
     
+    if session._analysis_cache is not None:
+        return session._analysis_cache
+    
     df = session.dataset
     
     try:
+        # One isnull pass shared by the count and percentage views
+        null_counts = df.isnull().sum()
+        
         analysis = {
             "basic_info": {
                 "shape": df.shape,
                 "columns": df.columns.tolist(),
                 "dtypes": df.dtypes.astype(str).to_dict(),
-                "memory_usage": f"{df.memory_usage(deep=True).sum() / 1024:.2f} KB"
+                "memory_usage": f"{session.dataset_nbytes / 1024:.2f} KB"
             },
-            "missing_values": df.isnull().sum().to_dict(),
-            "missing_percentage": (df.isnull().sum() / len(df) * 100).to_dict(),
-            "descriptive_stats": df.describe().to_dict(),
-            "numeric_columns": df.select_dtypes(include=[np.number]).columns.tolist(),
-            "categorical_columns": df.select_dtypes(include=['object', 'category']).columns.tolist(),
-            "unique_counts": {col: int(df[col].nunique()) for col in df.columns},
+            "missing_values": null_counts.to_dict(),
+            "missing_percentage": (null_counts / len(df) * 100).to_dict(),
+            "descriptive_stats": _matrix_payload(df.describe()),
+            "numeric_columns": session.numeric_cols,
+            "categorical_columns": session.categorical_cols,
+            "unique_counts": df.nunique().to_dict(),
             "duplicate_rows": int(df.duplicated().sum())
         }
         
-        return {"success": True, "analysis": analysis}
+        session._analysis_cache = {"success": True, "analysis": analysis}
+        return session._analysis_cache
     except Exception as e:
         return {"error": f"Analysis failed: {str(e)}"}
 
+def _numeric_stats(arr: np.ndarray) -> Dict[str, float]:
+    """Summary statistics of a float array, matching pandas' NaN-skipping Series methods"""
+    arr = arr[~np.isnan(arr)]
+    n = arr.size
+    if n == 0:
+        return {key: float('nan') for key in ("mean", "median", "std", "min", "max", "q1", "q3", "skewness", "kurtosis")}
+    
+    mean = arr.mean()
+    dev = arr - mean
+    m2 = float(dev @ dev)
+    dev2 = dev * dev
+    m3 = float((dev2 * dev).sum())
+    m4 = float((dev2 * dev2).sum())
+    q1, median, q3 = np.quantile(arr, (0.25, 0.5, 0.75)).tolist()
+    
+    # Unbiased (sample) skewness and excess kurtosis, as Series.skew()/kurtosis()
+    if n < 3:
+        skewness = float('nan')
+    else:
+        skewness = 0.0 if m2 == 0 else (n * (n - 1) ** 0.5 / (n - 2)) * (m3 / m2 ** 1.5)
+    if n < 4:
+        kurtosis = float('nan')
+    else:
+        denominator = (n - 2) * (n - 3) * m2 ** 2
+        kurtosis = 0.0 if denominator == 0 else (
+            n * (n + 1) * (n - 1) * m4 / denominator - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+        )
+    
+    return {
+        "mean": float(mean),
+        "median": median,
+        "std": (m2 / (n - 1)) ** 0.5 if n > 1 else float('nan'),
+        "min": float(arr.min()),
+        "max": float(arr.max()),
+        "q1": q1,
+        "q3": q3,
+        "skewness": float(skewness),
+        "kurtosis": float(kurtosis)
+    }
+
 def univariate_analysis(session_id: str, column: str) -> Dict:
     """Univariate analysis for a specific column"""
     session = get_session(session_id)
     
-    if session.dataset is None:
+    if not session.has_dataset:
         return {"error": "No dataset loaded"}
     
     df = session.dataset
@@ -150,18 +470,8 @@ def univariate_analysis(session_id: str, column: str) -> Dict:
         
         # Statistics only (visualization disabled)
         if pd.api.types.is_numeric_dtype(col_data):
-            # Numeric column statistics
-            stats = {
-                "mean": float(col_data.mean()),
-                "median": float(col_data.median()),
-                "std": float(col_data.std()),
-                "min": float(col_data.min()),
-                "max": float(col_data.max()),
-                "q1": float(col_data.quantile(0.25)),
-                "q3": float(col_data.quantile(0.75)),
-                "skewness": float(col_data.skew()),
-                "kurtosis": float(col_data.kurtosis())
-            }
+            # Numeric column statistics straight from the column store
+            stats = _numeric_stats(session.column_array(column))
         else:
             # Categorical column statistics
             value_counts = col_data.value_counts()
@@ -186,7 +496,7 @@ def bivariate_analysis(session_id: str, col1: str, col2: str) -> Dict:
     """Bivariate analysis between two columns"""
     session = get_session(session_id)
     
-    if session.dataset is None:
+    if not session.has_dataset:
         return {"error": "No dataset loaded"}
     
     df = session.dataset
@@ -195,14 +505,16 @@ def bivariate_analysis(session_id: str, col1: str, col2: str) -> Dict:
         return {"error": "One or both columns not found"}
     
     try:
-        data1 = df[col1].dropna()
-        data2 = df[col2].dropna()
-        
-        # Both numeric - calculate correlation
-        if pd.api.types.is_numeric_dtype(data1) and pd.api.types.is_numeric_dtype(data2):
-            valid_data = df[[col1, col2]].dropna()
-            # Calculate correlation
-            correlation = valid_data[col1].corr(valid_data[col2])
+        # Both numeric - calculate correlation over rows where both are present
+        if pd.api.types.is_numeric_dtype(df[col1]) and pd.api.types.is_numeric_dtype(df[col2]):
+            a = session.column_array(col1)
+            b = session.column_array(col2)
+            mask = ~(np.isnan(a) | np.isnan(b))
+            if mask.sum() < 2:
+                correlation = float('nan')
+            else:
+                with np.errstate(divide='ignore', invalid='ignore'):  # Constant column -> NaN, as in pandas
+                    correlation = np.corrcoef(a[mask], b[mask])[0, 1]
             stats = {"correlation": float(correlation)}
         else:
             # At least one categorical - cross tabulation
@@ -220,52 +532,62 @@ def bivariate_analysis(session_id: str, col1: str, col2: str) -> Dict:
     except Exception as e:
         return {"error": f"Bivariate analysis failed: {str(e)}"}
 
+def correlation_matrix(session: MLSession) -> np.ndarray:
+    """Correlation matrix of the session's numeric columns (in numeric_cols order), computed once per dataset.
+    
+    Missing values are mean-imputed first so the whole matrix comes from one np.corrcoef call.
+    Computed in float64 and rounded to 6 places, so the diagonal serializes as 1.0 and not 0.99999994.
+    """
+    if session._corr is None:
+        numeric_df = session.dataset[session.numeric_cols]
+        arr = numeric_df.fillna(numeric_df.mean()).to_numpy(dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):  # Constant columns give NaN, as in pandas
+            session._corr = np.atleast_2d(np.corrcoef(arr, rowvar=False)).round(6)
+    return session._corr
+
 def correlation_analysis(session_id: str) -> Dict:
     """Correlation analysis with heatmap"""
     session = get_session(session_id)
     
-    if session.dataset is None:
+    if not session.has_dataset:
         return {"error": "No dataset loaded"}
     
-    df = session.dataset
+    if session._correlation_cache is not None:
+        return session._correlation_cache
     
     try:
-        # Get only numeric columns
-        numeric_df = df.select_dtypes(include=[np.number])
-        
-        if numeric_df.empty:
+        if not session.numeric_cols:
             return {"error": "No numeric columns found for correlation analysis"}
         
-        # Calculate correlation matrix
-        corr_matrix = numeric_df.corr()
+        # Calculate correlation matrix (cached on the session)
+        corr = correlation_matrix(session)
+        names = session.numeric_cols
         
-        # Find highly correlated pairs
-        high_corr = []
-        for i in range(len(corr_matrix.columns)):
-            for j in range(i+1, len(corr_matrix.columns)):
-                if abs(corr_matrix.iloc[i, j]) > 0.7:
-                    high_corr.append({
-                        "feature1": corr_matrix.columns[i],
-                        "feature2": corr_matrix.columns[j],
-                        "correlation": float(corr_matrix.iloc[i, j])
-                    })
+        # Find highly correlated pairs (upper triangle only)
+        rows, cols, values = _high_corr_pairs(corr, 0.7)
+        high_corr = [
+            {"feature1": names[i], "feature2": names[j], "correlation": v}
+            for i, j, v in zip(rows.tolist(), cols.tolist(), values.tolist())
+        ]
         
-        return {
+        session._correlation_cache = {
             "success": True,
-            "correlation_matrix": corr_matrix.to_dict(),
+            "correlation_matrix": {"columns": names, "values": corr.tolist()},
             "high_correlations": high_corr,
             "plot": None,
             "note": "Visualization disabled - matplotlib removed to reduce deployment size"
         }
+        return session._correlation_cache
     except Exception as e:
         return {"error": f"Correlation analysis failed: {str(e)}"}
 
 def split_dataset(session_id: str, target_column: str, test_size: float = 0.2, 
-                  random_state: int = 42, feature_columns: Optional[List[str]] = None) -> Dict:
-    """Split dataset into train and test sets"""
+                  random_state: int = 42, feature_columns: Optional[List[str]] = None,
+                  use_float32: bool = False) -> Dict:
+    """Split dataset into train and test sets (optionally downcast to float32 to halve training memory)"""
     session = get_session(session_id)
     
-    if session.dataset is None:
+    if not session.has_dataset:
         return {"error": "No dataset loaded"}
     
     df = session.dataset
@@ -280,15 +602,26 @@ def split_dataset(session_id: str, target_column: str, test_size: float = 0.2,
             feature_columns = [col for col in df.columns if col != target_column]
         
         # Filter to numeric columns only
-        numeric_features = df[feature_columns].select_dtypes(include=[np.number]).columns.tolist()
+        numeric = set(session.numeric_cols)
+        numeric_features = [col for col in feature_columns if col in numeric]
         
         X = df[numeric_features]
         y = df[target_column]
         
-        # Handle missing values
-        X = X.fillna(X.mean())
+        # Handle missing values - column means are fitted once and reused by later
+        # splits on the same features (and available for inference on new rows)
+        imputer = session.imputer
+        if imputer is None or list(getattr(imputer, 'feature_names_in_', [])) != numeric_features:
+            imputer = SimpleImputer(strategy='mean', keep_empty_features=True).fit(X)
+            session.imputer = imputer
+        X = pd.DataFrame(imputer.transform(X), columns=numeric_features, index=X.index)
         y = y.fillna(y.mean() if pd.api.types.is_numeric_dtype(y) else y.mode()[0])
         
+        if use_float32:
+            X = X.astype(np.float32, copy=False)
+            if pd.api.types.is_numeric_dtype(y):
+                y = y.astype(np.float32, copy=False)
+        
         # Split
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=test_size, random_state=random_state
@@ -308,70 +641,60 @@ def split_dataset(session_id: str, target_column: str, test_size: float = 0.2,
             "feature_columns": numeric_features,
             "train_size": len(X_train),
             "test_size": len(X_test),
-            "train_test_ratio": f"{100*(1-test_size):.0f}/{100*test_size:.0f}"
+            "train_test_ratio": f"{100*(1-test_size):.0f}/{100*test_size:.0f}",
+            "dtype": "float32" if use_float32 else "original"
         }
     except Exception as e:
         return {"error": f"Dataset split failed: {str(e)}"}
 
-def train_model(session_id: str, model_type: str, **kwargs) -> Dict:
-    """Train a machine learning model"""
+def train_model(session_id: str, model_type: str, compute_train: bool = False, **kwargs) -> Dict:
+    """Train a machine learning model
+    
+    Training-set metrics need a full predict over X_train, so they are only
+    computed when compute_train is set (train_metrics is None otherwise).
+    """
     session = get_session(session_id)
     
     if session.X_train is None:
         return {"error": "Dataset not split. Please split the dataset first."}
     
     try:
-        # Select model based on type
-        models_map = {
-            "linear_regression": LinearRegression(),
-            "ridge": Ridge(**kwargs),
-            "lasso": Lasso(**kwargs),
-            "elastic_net": ElasticNet(**kwargs),
-            "decision_tree": DecisionTreeRegressor(**kwargs),
-            "random_forest": RandomForestRegressor(**kwargs),
-            "gradient_boosting": GradientBoostingRegressor(**kwargs),
-            "adaboost": AdaBoostRegressor(**kwargs),
-        }
-        
-        if model_type not in models_map:
-            return {"error": f"Unknown model type: {model_type}. Available: {list(models_map.keys())}"}
+        # Select model based on type - only the requested estimator is built
+        if model_type not in MODEL_CLASSES:
+            return {"error": f"Unknown model type: {model_type}. Available: {list(MODEL_CLASSES.keys())}"}
         
-        model = models_map[model_type]
+        if model_type in PARALLEL_MODELS:
+            kwargs.setdefault('n_jobs', -1)
+        model = MODEL_CLASSES[model_type](**kwargs)
         
         # Train model
         model.fit(session.X_train, session.y_train)
         
-        # Make predictions
-        y_train_pred = model.predict(session.X_train)
-        y_test_pred = model.predict(session.X_test)
-        
-        # Calculate metrics
-        train_metrics = {
-            "rmse": float(np.sqrt(mean_squared_error(session.y_train, y_train_pred))),
-            "mae": float(mean_absolute_error(session.y_train, y_train_pred)),
-            "r2": float(r2_score(session.y_train, y_train_pred))
-        }
-        
-        test_metrics = {
-            "rmse": float(np.sqrt(mean_squared_error(session.y_test, y_test_pred))),
-            "mae": float(mean_absolute_error(session.y_test, y_test_pred)),
-            "r2": float(r2_score(session.y_test, y_test_pred))
-        }
+        # Make predictions and calculate metrics
+        test_metrics = regression_metrics(session.y_test, model.predict(session.X_test))
+        train_metrics = None
+        if compute_train:
+            train_metrics = regression_metrics(session.y_train, model.predict(session.X_train))
         
         # Cross-validation
         cv_scores = cross_val_score(model, session.X_train, session.y_train, 
-                                    cv=5, scoring='r2')
+                                    cv=5, scoring='r2', n_jobs=-1)
         
-        # Feature importance (if available)
+        # Feature importance (if available) - top TOP_FEATURES only, partially sorted
         feature_importance = None
+        importances = None
         if hasattr(model, 'feature_importances_'):
-            importance_dict = dict(zip(session.feature_columns, model.feature_importances_))
-            feature_importance = sorted(importance_dict.items(), key=lambda x: x[1], reverse=True)
-            feature_importance = [{"feature": f, "importance": float(imp)} for f, imp in feature_importance]
+            importances = np.asarray(model.feature_importances_)
         elif hasattr(model, 'coef_'):
-            importance_dict = dict(zip(session.feature_columns, np.abs(model.coef_)))
-            feature_importance = sorted(importance_dict.items(), key=lambda x: x[1], reverse=True)
-            feature_importance = [{"feature": f, "importance": float(imp)} for f, imp in feature_importance]
+            importances = np.abs(np.ravel(model.coef_))
+        if importances is not None and importances.size:
+            top_k = min(TOP_FEATURES, importances.size)
+            idx = np.argpartition(importances, -top_k)[-top_k:]
+            idx = idx[np.argsort(importances[idx])[::-1]]
+            feature_importance = [
+                {"feature": session.feature_columns[i], "importance": float(importances[i])}
+                for i in idx.tolist()
+            ]
         
         # Store model
         session.models[model_type] = model
@@ -394,6 +717,13 @@ def train_model(session_id: str, model_type: str, **kwargs) -> Dict:
     except Exception as e:
         return {"error": f"Model training failed: {str(e)}"}
 
+def _split_fingerprint(session: MLSession) -> str:
+    """Short hash of the training split (columns, target and values) - keys persisted tuning studies"""
+    h = hashlib.sha1(repr((session.dataset_name, session.target_column, session.feature_columns)).encode())
+    h.update(pd.util.hash_pandas_object(session.X_train, index=True).values.tobytes())
+    h.update(pd.util.hash_pandas_object(session.y_train, index=True).values.tobytes())
+    return h.hexdigest()[:12]
+
 def tune_hyperparameters(session_id: str, model_type: str, n_trials: int = 50) -> Dict:
     """Hyperparameter tuning using Optuna"""
     if not HAS_OPTUNA:
@@ -405,6 +735,10 @@ def tune_hyperparameters(session_id: str, model_type: str, n_trials: int = 50) -
         return {"error": "Dataset not split. Please split the dataset first."}
     
     try:
+        # Same 3 unshuffled folds cross_val_score(cv=3) would use, computed once for all trials
+        X, y = session.X_train, session.y_train
+        folds = list(KFold(n_splits=3).split(X))
+        
         def objective(trial):
             params = {}
             
@@ -429,13 +763,34 @@ def tune_hyperparameters(session_id: str, model_type: str, n_trials: int = 50) -
             else:
                 raise ValueError(f"Hyperparameter tuning not supported for {model_type}")
             
-            # Cross-validation score
-            scores = cross_val_score(model, session.X_train, session.y_train, cv=3, scoring='r2')
-            return scores.mean()
-        
-        # Run optimization
-        study = optuna.create_study(direction='maximize', study_name=f'{model_type}_tuning')
-        study.optimize(objective, n_trials=n_trials, show_progress_bar=False)
+            # Cross-validation score, reported per fold so weak trials can be pruned early
+            scores = []
+            for fold_idx, (train_idx, val_idx) in enumerate(folds):
+                model.fit(X.iloc[train_idx], y.iloc[train_idx])
+                scores.append(r2_score(y.iloc[val_idx], model.predict(X.iloc[val_idx])))
+                trial.report(float(np.mean(scores)), fold_idx)
+                if trial.should_prune():
+                    raise optuna.TrialPruned()
+            return float(np.mean(scores))
+        
+        # Run optimization - trials run in parallel threads; constant_liar keeps the
+        # concurrent TPE suggestions from piling onto the same region
+        sampler = optuna.samplers.TPESampler(multivariate=True, constant_liar=True)
+        pruner = optuna.pruners.HyperbandPruner(min_resource=1, max_resource=len(folds))
+        # The study only resumes for the same training data - trials scored on another
+        # dataset, target or split must never supply best_params
+        storage = get_tuning_storage()
+        prefix = f'{session_id}::{model_type}::'
+        study_name = prefix + _split_fingerprint(session)
+        # Studies for this session's earlier splits can never be resumed - drop them
+        for name in optuna.study.get_all_study_names(storage):
+            if name.startswith(prefix) and name != study_name:
+                optuna.delete_study(study_name=name, storage=storage)
+        study = optuna.create_study(direction='maximize', study_name=study_name,
+                                    storage=storage, load_if_exists=True,
+                                    sampler=sampler, pruner=pruner)
+        n_jobs = max(1, (os.cpu_count() or 2) // 2)
+        study.optimize(objective, n_trials=n_trials, n_jobs=n_jobs, show_progress_bar=False)
         
         best_params = study.best_params
         best_score = study.best_value
@@ -447,6 +802,7 @@ def tune_hyperparameters(session_id: str, model_type: str, n_trials: int = 50) -
             result["best_hyperparameters"] = best_params
             result["best_cv_score"] = float(best_score)
             result["n_trials"] = n_trials
+            result["study_total_trials"] = len(study.trials)  # Includes trials resumed from earlier tunes
         
         return result
     except Exception as e:
@@ -460,7 +816,7 @@ def shap_analysis(session_id: str, model_name: str, max_samples: int = 100) -> D
     }
 
 def download_model(session_id: str, model_name: str, format: str = "joblib") -> Dict:
-    """Download trained model as pickle or joblib"""
+    """Serialize a trained model as pickle or joblib - "content" holds the raw file bytes"""
     session = get_session(session_id)
     
     if model_name not in session.models:
@@ -469,24 +825,22 @@ def download_model(session_id: str, model_name: str, format: str = "joblib") ->
     try:
         model = session.models[model_name]
         
-        # Serialize model
+        # Serialize model (protocol 5 pickles large arrays out-of-band without extra copies)
         buffer = io.BytesIO()
         if format == "joblib":
-            joblib.dump(model, buffer)
+            # Tree ensembles compress well; joblib has no zstd codec, zlib level 3 is the fast option
+            joblib.dump(model, buffer, compress=('zlib', 3), protocol=5)
         elif format == "pickle":
-            pickle.dump(model, buffer)
+            pickle.dump(model, buffer, protocol=5)
         else:
             return {"error": "Format must be 'joblib' or 'pickle'"}
         
-        buffer.seek(0)
-        model_bytes = base64.b64encode(buffer.read()).decode()
-        
         return {
             "success": True,
             "model_name": model_name,
             "format": format,
             "filename": f"{model_name}.{format}",
-            "data": model_bytes
+            "content": buffer.getvalue()
         }
     except Exception as e:
         return {"error": f"Model download failed: {str(e)}"}
@@ -497,10 +851,10 @@ def get_model_summary(session_id: str) -> Dict:
     
     return {
         "session_id": session_id,
-        "dataset_loaded": session.dataset is not None,
+        "dataset_loaded": session.has_dataset,
         "dataset_name": session.dataset_name,
-        "dataset_shape": session.dataset.shape if session.dataset is not None else None,
-        "split_done": session.X_train is not None,
+        "dataset_shape": session.dataset_shape,
+        "split_done": session.split_done,
         "target_column": session.target_column,
         "feature_columns": session.feature_columns,
         "trained_models": list(session.models.keys()),
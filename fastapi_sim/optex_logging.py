@@ -0,0 +1,26 @@
+"""
+Optimizer logging shared by main.py's integrated worker and optimizer_worker.py
+Records are handed to a queue and written by a listener thread, so stdout/file I/O never runs
+on the event loop. Set OPTEX_LOG_LEVEL=DEBUG for per-poll detail and OPTEX_LOG_FILE to also
+write a rotating log file. Call log_listener.start() at startup and log_listener.stop() on exit.
+"""
+
+import logging
+import logging.handlers
+import os
+import queue
+
+logger = logging.getLogger("optex.optimizer")
+logger.setLevel(os.environ.get("OPTEX_LOG_LEVEL", "INFO").upper())
+logger.propagate = False
+
+_log_handlers = [logging.StreamHandler()]
+if os.environ.get("OPTEX_LOG_FILE"):
+    _log_handlers.append(logging.handlers.RotatingFileHandler(
+        os.environ["OPTEX_LOG_FILE"], maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8"))
+for _handler in _log_handlers:
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s", "%H:%M:%S"))
+
+_log_queue = queue.SimpleQueue()
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+log_listener = logging.handlers.QueueListener(_log_queue, *_log_handlers)
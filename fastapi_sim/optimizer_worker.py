@@ -1,52 +1,101 @@
 """
 Optimizer Worker - Runs independently from the main FastAPI server
-Polls Firebase for optimization requests and executes them in the background
+Listens to Firebase for optimization requests and executes them in the background
 """
 
 import time
 import asyncio
-import firebase_admin
-from firebase_admin import credentials, firestore
+import logging
+import aiohttp
+import orjson
+from google.api_core import exceptions as gcp_exceptions
+from tenacity import AsyncRetrying, stop_after_attempt, wait_exponential_jitter, retry_if_exception_type
 import os
 import sys
 
-# Import the optimization logic from main.py
-# We'll need to refactor main.py to make the optimization function importable
+from firebase_client import POLL_INTERVAL, get_db, get_pooled_db, wait_for_state_change
+from optex_logging import logger as optimizer_logger, log_listener
+
+# Countdown/status lines are DEBUG, state transitions INFO - same OPTEX_LOG_LEVEL and
+# handlers as the integrated worker in main.py
+logger = optimizer_logger.getChild("worker")
+
+# Shared HTTP session - created on the worker's event loop, keeps backend connections alive
+SESSION = None
+OPTIMIZATION_TIMEOUT = aiohttp.ClientTimeout(total=600)  # 10 minute timeout for optimization
+BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:8000')
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Only the segment varies between runs - constraint_ranges/custom_pricing are left out (None/null)
+_PAYLOAD_BASE = {"n_data": 50, "use_custom_pricing": False}
+
+def get_http_session():
+    """Return the shared aiohttp session, creating it on first use"""
+    global SESSION
+    if SESSION is None or SESSION.closed:
+        SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=20),
+            headers={'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'}
+        )
+    return SESSION
+
+# Transient failures are retried with jittered exponential backoff (1s, 2s, 4s... capped at 30s)
+MAX_ATTEMPTS = 5
 
-def initialize_firebase():
-    """Initialize Firebase Admin SDK"""
+def log_retry(retry_state):
+    """tenacity before_sleep hook - report each retry so persistent failures stay visible"""
+    logger.warning("🔁 Attempt %d/%d failed (%s), retrying in %.1fs",
+                   retry_state.attempt_number, MAX_ATTEMPTS,
+                   retry_state.outcome.exception(), retry_state.next_action.sleep)
+
+def retrying(*exception_types):
+    """AsyncRetrying policy for the given transient exception types"""
+    return AsyncRetrying(
+        stop=stop_after_attempt(MAX_ATTEMPTS),
+        wait=wait_exponential_jitter(initial=1, max=30),
+        retry=retry_if_exception_type(exception_types),
+        before_sleep=log_retry,
+        reraise=True
+    )
+
+# optimized_targets records are queued and committed together in one WriteBatch
+FLUSH_MAX_RECORDS = 25  # well under Firestore's 500-mutation batch limit
+FLUSH_MAX_AGE = 60  # seconds
+_pending = []  # (doc_id, record) pairs waiting for the next commit
+_last_flush = time.time()
+
+async def maybe_flush(force=False):
+    """Commit queued optimized_targets records once enough piled up, they got old, or force=True"""
+    global _pending, _last_flush
+    if not _pending:
+        return
+    if not force and len(_pending) < FLUSH_MAX_RECORDS and time.time() - _last_flush < FLUSH_MAX_AGE:
+        return
+    
+    records, _pending = _pending, []
+    db = get_pooled_db()  # Writes rotate over the client pool, the listener keeps its own channel
+    collection = db.collection('optimized_targets')
+    batch = db.batch()
+    for doc_id, record in records:
+        batch.set(collection.document(doc_id), record)  # Fixed IDs keep a retried commit idempotent
     try:
-        if not firebase_admin._apps:
-            # Try production path first (Render secret files)
-            service_key_path = "/etc/secrets/serviceAccountKey.json"
-            
-            # Fallback to local development path
-            if not os.path.exists(service_key_path):
-                service_key_path = os.path.join(os.path.dirname(__file__), "serviceAccountKey.json")
-            
-            if os.path.exists(service_key_path):
-                cred = credentials.Certificate(service_key_path)
-                firebase_admin.initialize_app(cred)
-                print(f"✓ Firebase initialized with service account key: {service_key_path}")
-            else:
-                # Use default credentials (works with environment variables)
-                firebase_admin.initialize_app(options={
-                    'projectId': 'optex-b13d3',
-                })
-                print("✓ Firebase initialized with default credentials")
-        
-        db = firestore.client()
-        print("✓ Firestore client ready")
-        return db
+        async for attempt in retrying(gcp_exceptions.ServiceUnavailable):
+            with attempt:
+                await asyncio.to_thread(batch.commit)
+        logger.info("💾 Committed %d optimization record(s) to Firebase", len(records))
     except Exception as e:
-        print(f"⚠ Firebase initialization failed: {e}")
-        return None
+        logger.error("⚠ Error saving to Firebase, keeping %d record(s) for the next flush: %s", len(records), e)
+        _pending = records + _pending
+    _last_flush = time.time()
+
+# Import the optimization logic from main.py
+# We'll need to refactor main.py to make the optimization function importable
 
 def save_optimization_to_firebase(result, segment):
-    """Save optimization results to Firebase optimized_targets collection"""
+    """Queue optimization results for the optimized_targets collection (written by maybe_flush)"""
+    from firebase_admin import firestore  # Deferred like get_db(); already loaded once Firebase is up
+    
     try:
-        db = firestore.client()
-        
         # Convert optimization_history to a simple list if it exists
         opt_history = result.get('optimization_history', [])
         if opt_history and isinstance(opt_history, list):
@@ -67,177 +116,249 @@ def save_optimization_to_firebase(result, segment):
         
         # Debug: Verify what we're about to save
         if opt_history:
-            print(f"🔍 Debug: Saving {len(opt_history)} history items to Firebase")
-            print(f"🔍 Debug: First item to be saved keys: {opt_history[0].keys()}")
-            print(f"🔍 Debug: First item to be saved: {opt_history[0]}")
+            logger.debug("🔍 Saving %d history items to Firebase", len(opt_history))
+            logger.debug("🔍 First item to be saved keys: %s", opt_history[0].keys())
+            logger.debug("🔍 First item to be saved: %s", opt_history[0])
+        
+        apc = result.get('apc_optimization') or {}
+        eng = result.get('engineering_optimization') or {}
+        apc_value = apc.get('economic_value', 0)
+        eng_value = eng.get('economic_value', 0)
         
         optimization_record = {
             'timestamp': firestore.SERVER_TIMESTAMP,
             'segment': segment,
-            'apc_targets': result.get('apc_optimization', {}).get('suggested_targets', {}),
-            'apc_economic_value': result.get('apc_optimization', {}).get('economic_value', 0),
-            'apc_optimization_score': result.get('apc_optimization', {}).get('optimization_score', 0),
-            'engineering_targets': result.get('engineering_optimization', {}).get('suggested_targets', {}),
-            'engineering_economic_value': result.get('engineering_optimization', {}).get('economic_value', 0),
-            'engineering_optimization_score': result.get('engineering_optimization', {}).get('optimization_score', 0),
-            'economic_benefit': (result.get('engineering_optimization', {}).get('economic_value', 0) -
-                                result.get('apc_optimization', {}).get('economic_value', 0)),
+            'apc_targets': apc.get('suggested_targets', {}),
+            'apc_economic_value': apc_value,
+            'apc_optimization_score': apc.get('optimization_score', 0),
+            'engineering_targets': eng.get('suggested_targets', {}),
+            'engineering_economic_value': eng_value,
+            'engineering_optimization_score': eng.get('optimization_score', 0),
+            'economic_benefit': eng_value - apc_value,
             'pricing_details': result.get('pricing_details', {}),
             'optimization_history': opt_history  # Save the cleaned convergence plot data
         }
         
-        db.collection('optimized_targets').add(optimization_record)
-        print(f"💾 Optimization results saved to Firebase (history: {len(opt_history)} trials)")
-    except Exception as e:
-        print(f"⚠ Error saving to Firebase: {e}")
-        import traceback
-        traceback.print_exc()
+        _pending.append((f"{segment}_{time.time_ns()}", optimization_record))
+        logger.info("📝 Optimization results queued for Firebase (history: %d trials)", len(opt_history))
+    except Exception:
+        logger.exception("⚠ Error preparing Firebase record for %s", segment, extra={"segment": segment})
 
-def run_optimization(segment: str):
+async def run_optimization(segment: str):
     """
     Run the optimization by calling the INTERNAL POST endpoint
     This endpoint actually executes the optimization logic
     """
-    import requests
-    
-    backend_url = os.getenv('BACKEND_URL', 'http://localhost:8000')
-    
     try:
         # Call the POST endpoint with JSON payload
-        payload = {
-            "segment": segment,
-            "n_data": 50,
-            "use_custom_pricing": False
-            # Don't include constraint_ranges or custom_pricing if they're None/null
-        }
+        body = orjson.dumps({"segment": segment, **_PAYLOAD_BASE})
         
-        print(f"📡 Calling optimization API: POST {backend_url}/optimize_targets")
-        response = requests.post(
-            f'{backend_url}/optimize_targets',
-            json=payload,
-            timeout=600  # 10 minute timeout for optimization
-        )
+        logger.info("📡 Calling optimization API: POST %s/optimize_targets", BACKEND_URL)
+        session = get_http_session()
+        # Connection errors and 5xx responses are retried; 4xx and the 10 minute timeout are not
+        async for attempt in retrying(aiohttp.ClientError):
+            with attempt:
+                async with session.post(
+                    f'{BACKEND_URL}/optimize_targets',
+                    data=body,
+                    headers=JSON_HEADERS,
+                    timeout=OPTIMIZATION_TIMEOUT
+                ) as response:
+                    if response.status >= 500:
+                        response.raise_for_status()
+                    if response.status != 200:
+                        logger.error("✗ Optimization failed with status %d: %s", response.status, await response.text())
+                        return None
+                    result = orjson.loads(await response.read())
         
-        if response.status_code == 200:
-            result = response.json()
-            print(f"✓ Optimization completed for {segment}")
-            
-            # Debug: Check what we received
-            print(f"🔍 Debug: Result keys: {result.keys()}")
-            print(f"🔍 Debug: optimization_history type: {type(result.get('optimization_history'))}")
-            print(f"🔍 Debug: optimization_history length: {len(result.get('optimization_history', []))}")
+        logger.info("✓ Optimization completed for %s", segment)
+        
+        # Debug: Check what we received
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("🔍 Result keys: %s", result.keys())
+            logger.debug("🔍 optimization_history type: %s", type(result.get('optimization_history')))
+            logger.debug("🔍 optimization_history length: %d", len(result.get('optimization_history', [])))
             if result.get('optimization_history'):
                 first_item = result['optimization_history'][0]
-                print(f"🔍 Debug: First history item keys: {first_item.keys()}")
-                print(f"🔍 Debug: First history item: {first_item}")
+                logger.debug("🔍 First history item keys: %s", first_item.keys())
+                logger.debug("🔍 First history item: %s", first_item)
                 if 'optimization_vars' in first_item:
-                    print(f"🔍 Debug: optimization_vars in first item: {first_item['optimization_vars']}")
+                    logger.debug("🔍 optimization_vars in first item: %s", first_item['optimization_vars'])
                 if 'constraint_vars' in first_item:
-                    print(f"🔍 Debug: constraint_vars in first item: {first_item['constraint_vars']}")
-            
-            # Save results to Firebase
-            save_optimization_to_firebase(result, segment)
-            
-            return result
-        else:
-            print(f"✗ Optimization failed with status {response.status_code}")
-            print(f"Response: {response.text}")
-            return None
-    except Exception as e:
-        print(f"✗ Error running optimization: {e}")
-        import traceback
-        traceback.print_exc()
+                    logger.debug("🔍 constraint_vars in first item: %s", first_item['constraint_vars'])
+        
+        # Queue results for Firebase (committed at the end of the worker cycle)
+        save_optimization_to_firebase(result, segment)
+        
+        return result
+    except Exception:
+        logger.exception("✗ Error running optimization for %s", segment, extra={"segment": segment})
         return None
 
-async def check_and_run_optimization_worker(db):
+class WorkerCtx:
+    """Optimizer schedule parsed once per optimizer_state snapshot, counted down on the monotonic clock"""
+    
+    def __init__(self, state):
+        self.running = bool(state.get('running'))
+        self.auto_schedule = bool(state.get('autoSchedule'))
+        self.timer = state.get('timer', 300)
+        self.segment = state.get('segment', 'Clinkerization')
+        self.last_update_ms = state.get('lastUpdateTime')
+        self.last_update_monotonic = None
+        if self.last_update_ms:
+            # Anchor the wall-clock lastUpdateTime once - later countdowns ignore wall-clock jumps
+            age = (time.time_ns() // 1_000_000 - self.last_update_ms) / 1000
+            self.last_update_monotonic = time.monotonic() - age
+    
+    @property
+    def scheduled(self):
+        return self.running and self.auto_schedule
+    
+    def elapsed(self):
+        """Seconds since lastUpdateTime"""
+        return time.monotonic() - self.last_update_monotonic
+    
+    def restart(self, timer, last_update_ms):
+        """Mirror a timer reset written by this worker until the listener delivers it"""
+        self.timer = timer
+        self.last_update_ms = last_update_ms
+        self.last_update_monotonic = time.monotonic()
+    
+    def seconds_until_due(self):
+        """Seconds until the timer expires, or None if nothing is scheduled"""
+        if not self.scheduled:
+            return None
+        if self.last_update_monotonic is None:
+            return 0
+        return max(self.timer - self.elapsed(), 0)
+
+async def check_and_run_optimization_worker(db, ctx=None):
     """
     Check Firebase for optimization state and run if needed
     This is similar to the /check_and_run_optimization endpoint but runs independently
+    ctx comes from the listener's latest snapshot, otherwise the document is read
     """
     try:
         # Get current optimizer state
         state_ref = db.collection('optimizer_state').document('current')
-        state_doc = state_ref.get()
+        if ctx is None:
+            state_doc = await asyncio.to_thread(state_ref.get)
+            if not state_doc.exists:
+                logger.debug("No optimizer state found")
+                return
+            ctx = WorkerCtx(state_doc.to_dict())
         
-        if not state_doc.exists:
-            print("No optimizer state found")
-            return
-        
-        state = state_doc.to_dict()
-        
-        if not state.get('running') or not state.get('autoSchedule'):
-            print(f"Optimizer not running (running={state.get('running')}, autoSchedule={state.get('autoSchedule')})")
+        if not ctx.scheduled:
+            logger.debug("Optimizer not running (running=%s, autoSchedule=%s)", ctx.running, ctx.auto_schedule)
             return
         
         # Calculate elapsed time since last update
-        last_update = state.get('lastUpdateTime')
-        if last_update:
-            current_time = time.time() * 1000  # Convert to milliseconds
-            elapsed = (current_time - last_update) / 1000  # Convert to seconds
-            timer = state.get('timer', 300)
+        if ctx.last_update_monotonic is not None:
+            elapsed = ctx.elapsed()
+            timer = ctx.timer
             
-            print(f"Time since last update: {elapsed:.0f}s / {timer}s")
+            logger.debug("Time since last update: %.0fs / %ss", elapsed, timer)
             
             # Check if 5 minutes (300 seconds) have passed
             if elapsed >= timer:
-                segment = state.get('segment', 'Clinkerization')
-                print(f"⏰ Timer expired! Running optimization for {segment}...")
+                segment = ctx.segment
+                logger.info("⏰ Timer expired! Running optimization for %s...", segment)
                 
-                # Run optimization (synchronous)
-                result = run_optimization(segment)
+                # Run optimization (the loop stays free while the backend works)
+                result = await run_optimization(segment)
                 
                 if result:
                     # Reset timer
-                    state_ref.update({
+                    now_ms = time.time_ns() // 1_000_000
+                    await asyncio.to_thread(state_ref.update, {
                         'timer': 300,
-                        'lastUpdateTime': int(time.time() * 1000)
+                        'lastUpdateTime': now_ms
                     })
-                    print(f"✓ Optimization completed and timer reset")
+                    ctx.restart(300, now_ms)
+                    logger.info("✓ Optimization completed and timer reset")
                 else:
-                    print(f"✗ Optimization failed")
+                    logger.error("✗ Optimization failed")
             else:
                 remaining = timer - elapsed
-                print(f"⏳ Waiting... {remaining:.0f}s remaining")
+                logger.debug("⏳ Waiting... %.0fs remaining", remaining)
         else:
-            print("No lastUpdateTime found in state")
+            logger.warning("No lastUpdateTime found in state")
     
-    except Exception as e:
-        print(f"✗ Error in optimization worker: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("✗ Error in optimization worker")
+    finally:
+        await maybe_flush()
 
 async def main_loop():
-    """Main worker loop - polls every 10 seconds"""
+    """Main worker loop - reacts to optimizer_state changes and timer expiry"""
     print("=" * 60)
     print("🚀 Optimizer Worker Started")
     print("=" * 60)
     
-    db = initialize_firebase()
+    db = get_db()
     
     if not db:
         print("❌ Failed to initialize Firebase. Exiting...")
         return
     
-    print("\n👀 Watching for optimization requests...")
-    print("Polling interval: 10 seconds")
+    # Firestore pushes changes to optimizer_state/current - the callback runs on
+    # Firestore's own thread, so the worker is woken via call_soon_threadsafe
+    loop = asyncio.get_running_loop()
+    state_changed = asyncio.Event()
+    latest = {"received": False, "ctx": None}
+    
+    def on_state_change(docs, changes, read_time):
+        # Parse the schedule once per change instead of on every check
+        latest["ctx"] = WorkerCtx(docs[0].to_dict()) if docs and docs[0].exists else None
+        latest["received"] = True
+        loop.call_soon_threadsafe(state_changed.set)
+    
+    state_ref = db.collection('optimizer_state').document('current')
+    try:
+        state_watch = state_ref.on_snapshot(on_state_change)
+        print("\n👀 Watching for optimization requests (realtime listener)...")
+    except Exception as e:
+        state_watch = None
+        logger.warning("⚠ Could not attach state listener (%s), polling every %s seconds", e, POLL_INTERVAL)
     print("Press Ctrl+C to stop\n")
     
-    while True:
-        try:
-            await check_and_run_optimization_worker(db)
-            await asyncio.sleep(10)  # Check every 10 seconds
-        except KeyboardInterrupt:
-            print("\n\n🛑 Stopping optimizer worker...")
-            break
-        except Exception as e:
-            print(f"❌ Unexpected error in main loop: {e}")
-            import traceback
-            traceback.print_exc()
-            await asyncio.sleep(10)  # Wait before retrying
+    try:
+        while True:
+            try:
+                if state_watch is None:
+                    await check_and_run_optimization_worker(db)
+                    await asyncio.sleep(POLL_INTERVAL)
+                    continue
+                
+                ctx = latest["ctx"]
+                await wait_for_state_change(state_changed, ctx.seconds_until_due() if ctx else None)
+                
+                if not latest["received"]:
+                    continue  # No snapshot delivered yet
+                if latest["ctx"] is None:
+                    logger.debug("No optimizer state found")
+                    continue
+                await check_and_run_optimization_worker(db, latest["ctx"])
+            except KeyboardInterrupt:
+                logger.info("🛑 Stopping optimizer worker...")
+                break
+            except Exception:
+                logger.exception("❌ Unexpected error in main loop")
+                await asyncio.sleep(POLL_INTERVAL)  # Wait before retrying
+    finally:
+        if state_watch is not None:
+            state_watch.unsubscribe()
+        await maybe_flush(force=True)
+        if SESSION is not None and not SESSION.closed:
+            await SESSION.close()
 
 if __name__ == "__main__":
+    log_listener.start()
+    
     # Run the worker
     try:
         asyncio.run(main_loop())
     except KeyboardInterrupt:
         print("\n✓ Optimizer worker stopped")
+    finally:
+        log_listener.stop()
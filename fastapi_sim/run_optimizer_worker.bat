@@ -1,7 +1,7 @@
 @echo off
 echo Starting Optimizer Worker...
 echo.
-echo This worker runs independently and checks for optimization requests every 10 seconds
+echo This worker runs independently and listens to Firebase for optimization requests (polls every 10 seconds only as a fallback)
 echo Press Ctrl+C to stop
 echo.
 
@@ -1,6 +1,6 @@
 Write-Host "Starting Optimizer Worker..." -ForegroundColor Green
 Write-Host ""
-Write-Host "This worker runs independently and checks for optimization requests every 10 seconds" -ForegroundColor Yellow
+Write-Host "This worker runs independently and listens to Firebase for optimization requests (polls every 10 seconds only as a fallback)" -ForegroundColor Yellow
 Write-Host "Press Ctrl+C to stop" -ForegroundColor Yellow
 Write-Host ""
 
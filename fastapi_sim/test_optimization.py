@@ -4,11 +4,16 @@ Tests both APC limits and engineering limits optimization
 """
 import requests
 import json
+import orjson
 from datetime import datetime
 
+from http_session import make_session
+
 # Backend URL - update if different
 BACKEND_URL = "http://localhost:8000"
 
+SESSION = make_session()  # Pooled keep-alive connections to the backend
+
 def test_optimize_targets():
     """Test the /optimize_targets endpoint with dual optimization"""
     print("=" * 60)
@@ -25,7 +30,7 @@ def test_optimize_targets():
         print(f"\n📤 Sending POST request to {BACKEND_URL}/optimize_targets")
         print(f"Payload: {json.dumps(payload, indent=2)}")
         
-        response = requests.post(
+        response = SESSION.post(
             f"{BACKEND_URL}/optimize_targets",
             json=payload,
             timeout=120  # 2 minute timeout for optimization
@@ -34,7 +39,7 @@ def test_optimize_targets():
         print(f"\n✓ Response Status: {response.status_code}")
         
         if response.status_code == 200:
-            result = response.json()
+            result = orjson.loads(response.content)
             
             print("\n" + "=" * 60)
             print("OPTIMIZATION RESULTS")
@@ -102,10 +107,10 @@ def test_get_pricing():
     print("=" * 60)
     
     try:
-        response = requests.get(f"{BACKEND_URL}/get_pricing")
+        response = SESSION.get(f"{BACKEND_URL}/get_pricing")
         
         if response.status_code == 200:
-            pricing = response.json()
+            pricing = orjson.loads(response.content)
             print("\n✓ Current Pricing Configuration:")
             print("-" * 60)
             for key, value in pricing.items():
@@ -122,10 +127,10 @@ def test_optimization_history():
     print("=" * 60)
     
     try:
-        response = requests.get(f"{BACKEND_URL}/optimization_history")
+        response = SESSION.get(f"{BACKEND_URL}/optimization_history")
         
         if response.status_code == 200:
-            history = response.json()
+            history = orjson.loads(response.content)
             
             if history:
                 print(f"\n✓ Found {len(history)} optimization runs")
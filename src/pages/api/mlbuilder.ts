@@ -182,6 +182,28 @@ async function callMLFunction(functionName: string, args: any): Promise<any> {
       return { error: `Unknown function: ${functionName}` };
     }
 
+    // The backend streams the model file itself, so hand back a link instead of the bytes -
+    // but only for a model the session has actually trained
+    if (functionName === 'download_model') {
+      const summaryResponse = await fetch(`${BACKEND_URL}${urlMap.get_model_summary}`);
+      const summary = await summaryResponse.json();
+      if (summary.error) {
+        return summary;
+      }
+      if (!(summary.trained_models || []).includes(args.model_name)) {
+        return { error: `Model '${args.model_name}' not found` };
+      }
+
+      const format = args.format || 'joblib';
+      return {
+        success: true,
+        model_name: args.model_name,
+        format,
+        filename: `${args.model_name}.${format}`,
+        download_url: `${BACKEND_URL}${url}`
+      };
+    }
+
     const method = ['split_dataset', 'train_model', 'tune_hyperparameters'].includes(functionName) ? 'POST' : 'GET';
     
     const options: RequestInit = {
@@ -3,50 +3,79 @@ Test script to verify Firebase is receiving fluctuating data
 Run this while monitoring Firebase console
 """
 
-import requests
-import firebase_admin
-from firebase_admin import credentials, firestore
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import time
 import os
+import sys
 
-# Initialize Firebase
-service_key_path = os.path.join(os.path.dirname(__file__), "fastapi_sim", "serviceAccountKey.json")
-if os.path.exists(service_key_path):
-    cred = credentials.Certificate(service_key_path)
-    firebase_admin.initialize_app(cred)
-else:
-    firebase_admin.initialize_app(options={'projectId': 'optex-b13d3'})
+# Shared Firebase initialization and HTTP session live in fastapi_sim/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "fastapi_sim"))
+from firebase_client import get_db
+from http_session import make_session
 
-db = firestore.client()
+db = get_db()
+from firebase_admin import firestore  # After get_db(), which does the deferred firebase_admin import
+
+API_URL = "http://localhost:8000"
+N_READINGS = 10
+# Readings per WriteBatch (Firestore allows up to 500) - also the number of fetches in flight,
+# so each chunk's commit overlaps the fetches of the next chunk
+BATCH_COMMIT_SIZE = 5
+
+SESSION = make_session()  # Pooled keep-alive connections to the backend
+
+def fetch(_):
+    """One simulator step from the live API"""
+    return SESSION.get(f"{API_URL}/live_plant_state").json()
 
 print("🧪 Testing Firebase Write with Fluctuating Data")
 print("=" * 60)
 
-for i in range(10):
-    # Fetch from API
-    response = requests.get("http://localhost:8000/live_plant_state")
-    data = response.json()
-    
+# Pipeline: readings are queued as their fetches complete, and full batches are
+# committed on a separate thread while the remaining fetches are still in flight
+fetch_executor = ThreadPoolExecutor(max_workers=BATCH_COMMIT_SIZE)
+commit_executor = ThreadPoolExecutor(max_workers=1)
+commit_futures = []
+
+batch = db.batch()
+pending = 0
+
+for i, data in enumerate(fetch_executor.map(fetch, range(N_READINGS))):
     temp = data['kiln']['burning_zone_temp_c']
     fuel = data['kiln']['trad_fuel_rate_kg_hr']
     timestamp = data['timestamp']
     
     print(f"Iteration {i+1}: Temp={temp}°C, Fuel={fuel} kg/hr, Timestamp={timestamp}")
     
-    # Write to Firebase
-    doc_ref = db.collection('plant_readings').document(str(timestamp))
-    doc_ref.set({
+    # Queue the write - the packet timestamp has 1 s resolution, so concurrent readings
+    # can share it; the reading index keeps doc IDs unique within the batch
+    doc_id = f"{timestamp}_{i:02d}"
+    doc_ref = db.collection('plant_readings').document(doc_id)
+    batch.set(doc_ref, {
         'timestamp': firestore.SERVER_TIMESTAMP,
         'kpi': data['kpi'],
         'raw_mill': data['raw_mill'],
         'kiln': data['kiln'],
         'production': data['production']
     })
+    pending += 1
     
-    print(f"  ✅ Written to Firebase (doc ID: {timestamp})")
+    print(f"  📝 Queued for Firebase (doc ID: {doc_id})")
     
-    time.sleep(3)  # Wait 3 seconds between writes
+    if pending >= BATCH_COMMIT_SIZE:
+        commit_futures.append(commit_executor.submit(batch.commit))
+        print(f"  📤 Committing {pending} documents in the background")
+        batch = db.batch()
+        pending = 0
+
+if pending:
+    commit_futures.append(commit_executor.submit(batch.commit))
+
+for future in commit_futures:
+    future.result()  # Surface any commit error
+fetch_executor.shutdown()
+commit_executor.shutdown()
+print(f"✅ Committed {N_READINGS} documents to Firebase in {len(commit_futures)} batch(es)")
 
 print("\n" + "=" * 60)
 print("✅ Test complete! Check Firebase console - you should see 10 documents")
@@ -1,27 +1,43 @@
 """
 Quick test script to verify fuel and temperature fluctuations
 """
-import requests
-import time
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+
+# Shared helpers live in fastapi_sim/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "fastapi_sim"))
+from http_session import make_session
+
+API_URL = "http://localhost:8000"
+N_READINGS = 10
+
+SESSION = make_session()  # Pooled keep-alive connections to the backend
+
+def fetch(_):
+    """One simulator step from the live API (None on HTTP error)"""
+    response = SESSION.get(f"{API_URL}/live_plant_state")
+    if response.status_code != 200:
+        print(f"Error: {response.status_code}")
+        return None
+    return response.json()
 
 print("Testing Plant Simulator Fluctuations")
 print("=" * 60)
 
-# Get 10 consecutive readings
-for i in range(10):
-    response = requests.get("http://localhost:8000/live_plant_state")
-    if response.status_code == 200:
-        data = response.json()
-        
-        trad_fuel = data['kiln']['trad_fuel_rate_kg_hr']
-        alt_fuel = data['kiln']['alt_fuel_rate_kg_hr']
-        temp = data['kiln']['burning_zone_temp_c']
-        
-        print(f"Reading {i+1:2d}: Trad Fuel: {trad_fuel:6.0f} kg/hr | Alt Fuel: {alt_fuel:5.0f} kg/hr | Temp: {temp:6.1f}°C")
-    else:
-        print(f"Error: {response.status_code}")
+# Get 10 readings concurrently - each request runs its own simulator step
+with ThreadPoolExecutor(max_workers=N_READINGS) as executor:
+    readings = list(executor.map(fetch, range(N_READINGS)))
+
+for i, data in enumerate(readings):
+    if data is None:
+        continue
+    
+    trad_fuel = data['kiln']['trad_fuel_rate_kg_hr']
+    alt_fuel = data['kiln']['alt_fuel_rate_kg_hr']
+    temp = data['kiln']['burning_zone_temp_c']
     
-    time.sleep(1)
+    print(f"Reading {i+1:2d}: Trad Fuel: {trad_fuel:6.0f} kg/hr | Alt Fuel: {alt_fuel:5.0f} kg/hr | Temp: {temp:6.1f}°C")
 
 print("=" * 60)
 print("✓ Check the values above - they should vary between readings!")